@@ -0,0 +1,304 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import subprocess
+import numpy as np
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+COMPANIES = {
+    "GOOGL": {"cik": "1652044", "key": "google", "name": "Alphabet Inc.",
+              "segments": ["Google Services", "Google Cloud", "Other Bets"], "base": 180000},
+    "MSFT": {"cik": "789019", "key": "microsoft", "name": "Microsoft Corporation",
+             "segments": ["Productivity and Business Processes", "Intelligent Cloud", "More Personal Computing"], "base": 160000},
+    "NVDA": {"cik": "1045810", "key": "nvidia", "name": "NVIDIA Corporation",
+             "segments": ["Data Center", "Gaming", "Professional Visualization", "Automotive"], "base": 20000},
+}
+YEARS = (2022, 2023, 2024)
+NARRATIVE = [
+    "Our results of operations may fluctuate due to changes in customer demand, pricing and the timing of product launches.",
+    "We face intense competition across our businesses, and competitors may introduce products that reduce demand for ours.",
+    "Foreign exchange rates affected reported revenue, and we expect currency movements to continue to affect our results.",
+    "Research and development expenses increased primarily driven by investments in compute infrastructure and headcount.",
+    "We returned cash to shareholders through share repurchases and dividends, funded by cash flows from operations.",
+    "Cost of revenue increased driven by higher depreciation of servers and network equipment in our data centers.",
+    "Changes in tax law in the jurisdictions where we operate could adversely affect our effective tax rate.",
+    "Operating margin reflects the mix of higher-margin software and services against hardware and infrastructure costs.",
+]
+QUESTIONS = [
+    "What was {name}'s total revenue in {year}?",
+    "What was {name}'s operating income in {year}?",
+    "How much revenue did {name}'s {segment} segment generate in {year}?",
+    "How did {name}'s net income change between {prev} and {year}?",
+    "Compare the total revenue of Microsoft and NVIDIA in {year}.",
+    "Which company had the highest operating income in {year}?",
+]
+
+
+def _money(value):
+    return f"${value:,}"
+
+
+def financials(ticker, year):
+    rng = random.Random(f"{ticker}-{year}")
+    info = COMPANIES[ticker]
+    revenue = int(info["base"] * (1.12 ** (year - 2022)) * rng.uniform(0.95, 1.05))
+    shares = [rng.uniform(0.5, 1.5) for _ in info["segments"]]
+    segments = {s: int(revenue * w / sum(shares)) for s, w in zip(info["segments"], shares)}
+    operating = int(revenue * rng.uniform(0.25, 0.45))
+    return {"revenue": revenue, "segments": segments, "operating_income": operating, "net_income": int(operating * 0.82)}
+
+
+def synthetic_filing(ticker, year, pages=40):
+    """A 10-K-like PDF: narrative pages plus income statement and segment tables for three fiscal years."""
+    import pymupdf
+    rng = random.Random(f"{ticker}-{year}-text")
+    info = COMPANIES[ticker]
+    years = [year, year - 1, year - 2]
+    fin = {y: financials(ticker, y) for y in years}
+    doc = pymupdf.open()
+    for page_no in range(pages):
+        if page_no == pages // 2:
+            lines = [f"{info['name']}", "CONSOLIDATED INCOME STATEMENTS", "(In millions, except per share amounts)",
+                     "Year Ended " + "  ".join(str(y) for y in years)]
+            for label, key in (("Total revenue", "revenue"), ("Operating income", "operating_income"), ("Net income", "net_income")):
+                lines.append(f"{label} " + " ".join(_money(fin[y][key]) for y in years))
+        elif page_no == pages // 2 + 1:
+            lines = ["SEGMENT INFORMATION", "(In millions)", "Year Ended " + "  ".join(str(y) for y in years)]
+            for segment in info["segments"]:
+                lines.append(f"{segment} " + " ".join(_money(fin[y]["segments"][segment]) for y in years))
+            lines.append("Total " + " ".join(_money(fin[y]["revenue"]) for y in years))
+        else:
+            lines = [f"{info['name']} | Fiscal {year} Form 10-K | Item {page_no % 15 + 1}"]
+            for _ in range(rng.randint(6, 10)):
+                sentence = rng.choice(NARRATIVE)
+                figure = _money(rng.randint(100, 90000))
+                lines.append(f"{sentence} The related amount was {figure} million in fiscal {rng.choice(years)}.")
+        page = doc.new_page()
+        page.insert_textbox(pymupdf.Rect(54, 54, 558, 738), "\n".join(lines), fontsize=9)
+    return doc.tobytes()
+
+
+def stub_filings(pages):
+    filings, documents = {}, {}
+    for ticker, info in COMPANIES.items():
+        filings[info["cik"]] = []
+        for year in YEARS:
+            url = f"https://www.sec.gov/Archives/{ticker}/{year}/10k.htm"
+            documents[url] = synthetic_filing(ticker, year, pages)
+            filings[info["cik"]].append({"accessionNo": f"0000-{ticker}-{year}", "linkToFilingDetails": url, "filedAt": f"{year}-02-01"})
+    return filings, documents
+
+
+def bedrock_responder(body):
+    if body.get("system", "").startswith("Given a user query"):
+        return json.dumps({"decomposition": False, "companies_year": ["microsoft_2023"], "queries": []})
+    context = body["messages"][0]["content"]
+    return json.dumps({"answer": f"Answer drawn from {len(context)} characters of context.", "reasoning": "stub", "source": []})
+
+
+def questions(n, seed=0):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        ticker = rng.choice(list(COMPANIES))
+        year = rng.choice(YEARS[1:])
+        out.append(rng.choice(QUESTIONS).format(
+            name=COMPANIES[ticker]["name"].split()[0], year=year, prev=year - 1,
+            segment=rng.choice(COMPANIES[ticker]["segments"])
+        ))
+    return out
+
+
+class StageTimer:
+    """Wraps instance methods so every call records its wall time under a stage name."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def record(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, obj, attr, stage):
+        fn = getattr(obj, attr)
+
+        def timed(*args, **kwargs):
+            name = stage(args, kwargs) if callable(stage) else stage
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+
+        setattr(obj, attr, timed)
+
+    def summary(self):
+        return {stage: percentiles(values) for stage, values in self.samples.items()}
+
+
+def percentiles(values):
+    ms = np.asarray(values) * 1000
+    return {
+        "count": int(len(ms)),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux; children covers the ingestion process pool
+    self_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {"self": round(self_kb / 1024, 1), "children": round(children_kb / 1024, 1)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    from stub_servers import BedrockStubServer, SecApiStubServer
+    results = {}
+    filings, documents = stub_filings(args.pages)
+    with SecApiStubServer(filings, documents) as sec, BedrockStubServer(bedrock_responder, latency=args.llm_latency) as bedrock:
+        os.environ.update({
+            "SEC_API_BASE_URL": sec.url, "API_KEY": "bench",
+            "BEDROCK_ENDPOINT_URL": bedrock.url, "REGION": "us-east-1", "ACCESSKEY": "bench", "SECRETKEY": "bench",
+            "LLM_CACHE": "0",
+        })
+        from get_docs import ExtractDocuments
+        start = time.perf_counter()
+        ExtractDocuments().main()
+        results["download"] = {"filings": len(documents), "seconds": round(time.perf_counter() - start, 3)}
+
+        import main
+        from index_registry import index_registry
+        indexer = main.PageIndexer()
+        indexer.model.encode(["warm up"], normalize_embeddings=True)
+
+        pdfs = sorted(Path("temp").glob("*.pdf"))
+        total_pages = len(pdfs) * args.pages
+        start = time.perf_counter()
+        indexer.build_indexes_in_folder("temp", overwrite=True, workers=args.ingest_workers)
+        indexer.refresh_corpus_index()
+        elapsed = time.perf_counter() - start
+        results["ingestion"] = {
+            "pages": total_pages,
+            "seconds": round(elapsed, 3),
+            "pages_per_sec": round(total_pages / elapsed, 2),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+        texts = []
+        for pdf in pdfs:
+            _, _, store = indexer._load_index_and_meta(pdf.name)
+            texts.extend(store.text(i) for i in range(len(store)))
+        texts = texts[:args.embed_texts]
+        start = time.perf_counter()
+        indexer.model.encode(texts, normalize_embeddings=True)
+        elapsed = time.perf_counter() - start
+        results["embedding"] = {"texts": len(texts), "seconds": round(elapsed, 3), "texts_per_sec": round(len(texts) / elapsed, 1)}
+
+        load_times = []
+        for pdf in pdfs:
+            index_registry.invalidate()
+            start = time.perf_counter()
+            indexer._load_index_and_meta(pdf.name)
+            if indexer.retrieval_mode == "hybrid":
+                indexer._load_lexical_index(pdf.name)
+            load_times.append(time.perf_counter() - start)
+        results["index_load"] = percentiles(load_times)
+
+        timer = StageTimer()
+        timer.wrap(indexer, "build_indexes_in_folder", "index_check")
+        timer.wrap(indexer, "_decompose", "decomposition")
+        timer.wrap(indexer.model, "encode", "encode")
+        timer.wrap(indexer, "search_many", "retrieval")
+        timer.wrap(indexer, "get_page_passages", "page_text")
+        timer.wrap(indexer.context_builder, "build", "context")
+        timer.wrap(indexer.llm, "_call_llm", lambda args, kwargs: f"llm_{kwargs.get('stage') or 'call'}")
+        for query in questions(args.queries, seed=args.seed):
+            start = time.perf_counter()
+            indexer.main(query)
+            timer.record("total", time.perf_counter() - start)
+        results["query_stages"] = timer.summary()
+        results["queries"] = {
+            "count": args.queries,
+            "llm_calls": bedrock.calls,
+            "planner": indexer.planner.stats() if indexer.planner is not None else None,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    return results
+
+
+def _flatten(d, prefix=""):
+    out = {}
+    for key, value in d.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[name] = value
+    return out
+
+
+def compare(baseline, current):
+    """Relative change of every numeric result shared by two reports."""
+    old, new = _flatten(baseline["results"]), _flatten(current["results"])
+    return {
+        key: {"baseline": old[key], "current": new[key], "change_pct": round(100 * (new[key] - old[key]) / old[key], 1) if old[key] else None}
+        for key in sorted(old.keys() & new.keys())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of ingestion and the query pipeline.")
+    parser.add_argument("--pages", type=int, default=40, help="pages per synthetic filing")
+    parser.add_argument("--queries", type=int, default=60)
+    parser.add_argument("--embed-texts", type=int, default=2000, help="chunks encoded for the embedding throughput figure")
+    parser.add_argument("--ingest-workers", type=int, default=None)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the stub Bedrock server waits per call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="scratch directory (default: a new temporary directory)")
+    parser.add_argument("--out", default=None, help="write the JSON report here as well as to stdout")
+    parser.add_argument("--compare", default=None, help="baseline JSON report to diff against")
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="bench_e2e_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    out = Path(args.out).resolve() if args.out else None
+    baseline = Path(args.compare).resolve() if args.compare else None
+    sys.path.insert(0, str(HERE))
+    os.chdir(workdir)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            **{k: v for k, v in vars(args).items() if k not in ("out", "compare", "workdir")},
+            **{k: os.getenv(k) for k in ("EMBED_MODEL_NAME", "EMBED_BACKEND", "INDEX_BACKEND", "INDEX_TYPE", "RETRIEVAL_MODE", "PDF_BACKEND")},
+        },
+        "workdir": str(workdir),
+        "results": run(args),
+    }
+    if baseline:
+        with open(baseline, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(json.load(f), report)
+    text = json.dumps(report, indent=2)
+    if out:
+        out.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
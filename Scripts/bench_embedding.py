@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+from pathlib import Path
+from embedder import Embedder
+from chunk_store import ChunkStore
+
+
+def load_corpus_texts(index_dir="indexes", limit=2000):
+    texts = []
+    for store_path in sorted(Path(index_dir).glob("*.chunks")):
+        store = ChunkStore(store_path)
+        texts.extend(store.text(i) for i in range(len(store)))
+        if len(texts) >= limit:
+            break
+    return texts[:limit]
+
+
+def parity(reference, candidate, n_queries=32, k=10):
+    """Cosine agreement per text and top-k neighbour overlap between two embeddings of the same texts."""
+    cos = np.sum(reference * candidate, axis=1)
+    queries = np.arange(min(n_queries, len(reference)))
+    ref_top = np.argsort(-(reference[queries] @ reference.T), axis=1)[:, :k]
+    cand_top = np.argsort(-(candidate[queries] @ candidate.T), axis=1)[:, :k]
+    overlap = [len(set(a) & set(b)) / k for a, b in zip(ref_top.tolist(), cand_top.tolist())]
+    return {
+        "mean_cosine": round(float(cos.mean()), 5),
+        "min_cosine": round(float(cos.min()), 5),
+        f"top{k}_overlap": round(float(np.mean(overlap)), 4),
+    }
+
+
+def bench_backend(model_name, backend, texts, runs=2):
+    load_start = time.perf_counter()
+    embedder = Embedder(model_name, backend=backend)
+    load_s = time.perf_counter() - load_start
+    embedder.encode(texts[:8], normalize_embeddings=True)
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        embs = embedder.encode(texts, normalize_embeddings=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return embs, {
+        "load_s": round(load_s, 3),
+        "encode_s": round(best, 3),
+        "texts_per_sec": round(len(texts) / best, 1),
+    }
+
+
+def main():
+    model_name = os.getenv("EMBED_MODEL_NAME")
+    backends = sys.argv[1:] or ["torch", "int8", "onnx"]
+    min_cosine = float(os.getenv("PARITY_MIN_COSINE", "0.99"))
+    texts = load_corpus_texts()
+    if not texts:
+        raise SystemExit("No chunk stores found in indexes/. Build indexes first.")
+
+    reference, report = None, {"model": model_name, "texts": len(texts), "backends": {}}
+    for backend in ["torch"] + [b for b in backends if b != "torch"]:
+        try:
+            embs, result = bench_backend(model_name, backend, texts)
+        except ImportError as e:
+            report["backends"][backend] = {"skipped": str(e)}
+            continue
+        # the first backend that loads (torch unless it is unavailable) is the reference
+        if reference is None:
+            reference = embs
+            report["reference"] = backend
+        else:
+            result["parity"] = parity(reference, embs)
+            result["speedup_vs_reference"] = round(result["texts_per_sec"] / report["backends"][report["reference"]]["texts_per_sec"], 2)
+        report["backends"][backend] = result
+
+    failed = [b for b, r in report["backends"].items() if r.get("parity", {}).get("mean_cosine", 1.0) < min_cosine]
+    report["parity_min_cosine"] = min_cosine
+    report["parity_failed"] = failed
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
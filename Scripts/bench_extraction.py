@@ -0,0 +1,65 @@
+import re
+import sys
+import json
+import time
+from pathlib import Path
+from collections import Counter
+from utils import EXTRACTORS, get_extractor
+
+_word = re.compile(r"\w+")
+_number = re.compile(r"\$?\d[\d,]*(?:\.\d+)?")
+
+
+def _f1(a, b):
+    overlap = sum((a & b).values())
+    total = sum(a.values()) + sum(b.values())
+    return 2 * overlap / total if total else 1.0
+
+
+def bench_pdf(pdf_path, backends, workers=1):
+    texts, results = {}, {}
+    for name in backends:
+        extractor = get_extractor(name)
+        start = time.perf_counter()
+        pages = list(extractor.iter_pages(pdf_path, workers=workers))
+        elapsed = time.perf_counter() - start
+        texts[name] = " ".join(pages)
+        results[name] = {
+            "pages": len(pages),
+            "seconds": round(elapsed, 4),
+            "pages_per_sec": round(len(pages) / elapsed, 2) if elapsed else None,
+            "chars": len(texts[name]),
+            "numbers": len(_number.findall(texts[name])),
+        }
+    # fidelity: agreement of word and number multisets with the other backends
+    for name in backends:
+        words = Counter(_word.findall(texts[name].lower()))
+        numbers = Counter(_number.findall(texts[name]))
+        others = [b for b in backends if b != name]
+        results[name]["word_f1_vs"] = {
+            b: round(_f1(words, Counter(_word.findall(texts[b].lower()))), 4) for b in others
+        }
+        results[name]["number_f1_vs"] = {
+            b: round(_f1(numbers, Counter(_number.findall(texts[b]))), 4) for b in others
+        }
+    return results
+
+
+def main(folder="temp", workers=1):
+    pdfs = sorted(Path(folder).glob("*.pdf"))
+    backends = list(EXTRACTORS)
+    report = {"workers": workers, "files": {}}
+    for pdf in pdfs:
+        report["files"][pdf.name] = bench_pdf(pdf, backends, workers=workers)
+    totals = {}
+    for name in backends:
+        pages = sum(r[name]["pages"] for r in report["files"].values())
+        seconds = sum(r[name]["seconds"] for r in report["files"].values())
+        totals[name] = {"pages": pages, "seconds": round(seconds, 4), "pages_per_sec": round(pages / seconds, 2) if seconds else None}
+    report["totals"] = totals
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "temp", int(sys.argv[2]) if len(sys.argv) > 2 else 1)
@@ -0,0 +1,94 @@
+import sys
+import json
+import time
+import tempfile
+import numpy as np
+from pathlib import Path
+from chunk_store import load_meta_and_store
+from vector_index import INDEX_TYPES, VectorIndex, index_config
+
+
+def load_filing_vectors(index_dir="indexes"):
+    """Exact (or best available) vectors of every per-filing index in index_dir."""
+    filings = {}
+    for meta_path in sorted(Path(index_dir).glob("*.meta.json")):
+        pdf_name = meta_path.name[:-len(".meta.json")]
+        idx_path = meta_path.with_name(f"{pdf_name}.index")
+        if pdf_name == "corpus" or not idx_path.exists():
+            continue
+        meta, _ = load_meta_and_store(meta_path)
+        filings[pdf_name] = VectorIndex.read(idx_path, meta.get("index_params")).vectors_for_export()
+    return filings
+
+
+def _recall(truth, found, k):
+    return float(np.mean([len(set(t[:k]) & set(f[:k])) / k for t, f in zip(truth.tolist(), found.tolist())]))
+
+
+def bench_type(embs, queries, index_type, k, workdir):
+    config = index_config(index_type)
+    idx_path = Path(workdir) / f"bench_{index_type}.index"
+    start = time.perf_counter()
+    index, params = VectorIndex.write(idx_path, embs, config)
+    build_s = time.perf_counter() - start
+    index = VectorIndex.read(idx_path, params)
+
+    truth = np.argsort(-(queries @ embs.T), axis=1)[:, :k]
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for row, q in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(q[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        found[row] = ids[0]
+    # the same index without re-ranking, to show what the exact pass buys
+    _, raw_ids = index.index.search(queries, k)
+
+    rerank_bytes = index.vectors.nbytes if index.vectors is not None else 0
+    return {
+        "params": params,
+        "build_s": round(build_s, 4),
+        "index_bytes": idx_path.stat().st_size,
+        "rerank_vector_bytes": rerank_bytes,
+        "bytes_per_vector": round(idx_path.stat().st_size / len(embs), 1),
+        f"recall@{k}": round(_recall(truth, found, k), 4),
+        f"recall@{k}_no_rerank": round(_recall(truth, raw_ids, k), 4),
+        "latency_ms_p50": round(1000 * float(np.percentile(latencies, 50)), 4),
+        "latency_ms_p95": round(1000 * float(np.percentile(latencies, 95)), 4),
+    }
+
+
+def main(index_dir="indexes", k=5, n_queries=100, seed=0):
+    filings = load_filing_vectors(index_dir)
+    if not filings:
+        raise SystemExit(f"No per-filing indexes found in {index_dir}. Build indexes first.")
+    rng = np.random.default_rng(seed)
+    report = {"k": k, "filings": {}, "totals": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        for pdf_name, embs in filings.items():
+            # queries: perturbed chunk vectors, so the nearest neighbour is not always the chunk itself
+            rows = rng.choice(len(embs), size=min(n_queries, len(embs)), replace=False)
+            queries = embs[rows] + rng.normal(scale=0.05, size=(len(rows), embs.shape[1])).astype(np.float32)
+            queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+            report["filings"][pdf_name] = {
+                index_type: bench_type(embs, queries, index_type, k, workdir) for index_type in INDEX_TYPES
+            }
+    for index_type in INDEX_TYPES:
+        results = [r[index_type] for r in report["filings"].values()]
+        index_bytes = sum(r["index_bytes"] for r in results)
+        report["totals"][index_type] = {
+            "index_bytes": index_bytes,
+            "rerank_vector_bytes": sum(r["rerank_vector_bytes"] for r in results),
+            "compression_vs_flat": None,
+            f"recall@{k}": round(float(np.mean([r[f"recall@{k}"] for r in results])), 4),
+            "latency_ms_p50": round(float(np.mean([r["latency_ms_p50"] for r in results])), 4),
+        }
+    flat_bytes = report["totals"]["flat"]["index_bytes"]
+    for totals in report["totals"].values():
+        totals["compression_vs_flat"] = round(flat_bytes / totals["index_bytes"], 2) if totals["index_bytes"] else None
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "indexes", int(sys.argv[2]) if len(sys.argv) > 2 else 5)
@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+from bench_e2e import HERE, stub_filings, bedrock_responder, questions, git_commit
+
+
+async def _service_run(indexer, queries, concurrency):
+    from service import QueryService
+    async with QueryService(indexer) as service:
+        pending = list(queries)
+
+        async def client():
+            while pending:
+                await service.answer(pending.pop())
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - start, service.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of QueryService under concurrent load vs. sequential main() calls.")
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds the stub Bedrock server waits per call")
+    parser.add_argument("--workdir", default=None)
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="bench_service_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    sys.path.insert(0, str(HERE))
+    os.chdir(workdir)
+
+    from stub_servers import BedrockStubServer, SecApiStubServer
+    filings, documents = stub_filings(args.pages)
+    with SecApiStubServer(filings, documents) as sec, BedrockStubServer(bedrock_responder, latency=args.llm_latency) as bedrock:
+        os.environ.update({
+            "SEC_API_BASE_URL": sec.url, "API_KEY": "bench",
+            "BEDROCK_ENDPOINT_URL": bedrock.url, "REGION": "us-east-1", "ACCESSKEY": "bench", "SECRETKEY": "bench",
+            "LLM_CACHE": "0",
+        })
+        from get_docs import ExtractDocuments
+        import main as pipeline
+        ExtractDocuments().main()
+        indexer = pipeline.PageIndexer()
+        indexer.build_indexes_in_folder("temp")
+        indexer.warm_up()
+        queries = questions(args.queries)
+
+        sequential_n = max(1, min(len(queries), args.queries // 4))
+        start = time.perf_counter()
+        for query in queries[:sequential_n]:
+            indexer.main(query)
+        sequential_s = time.perf_counter() - start
+
+        service_s, stats = asyncio.run(_service_run(indexer, queries, args.concurrency))
+
+    sequential_qps = sequential_n / sequential_s
+    service_qps = len(queries) / service_s
+    report = {
+        "commit": git_commit(),
+        "config": vars(args),
+        "sequential": {"queries": sequential_n, "seconds": round(sequential_s, 3), "qps": round(sequential_qps, 2)},
+        "service": {"queries": len(queries), "seconds": round(service_s, 3), "qps": round(service_qps, 2), **stats},
+        "speedup": round(service_qps / sequential_qps, 2),
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import os
+import sys
+import json
+import subprocess
+
+HEAVY_MODULES = ["torch", "faiss", "sentence_transformers", "transformers", "boto3", "sec_api"]
+
+_PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+indexer = main.PageIndexer()
+t2 = time.perf_counter()
+heavy = [m for m in {heavy!r} if m in sys.modules]
+warm = None
+if {warm!r}:
+    indexer.warm_up()
+    warm = time.perf_counter() - t2
+print(json.dumps({{"import_s": t1 - t0, "construct_s": t2 - t1, "heavy_modules": heavy, "warm_up_s": warm}}))
+"""
+
+
+def measure(warm=False, runs=3):
+    """Time `import main` + PageIndexer() in fresh interpreters; returns the best run."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(heavy=HEAVY_MODULES, warm=warm)],
+            cwd=here, capture_output=True, text=True, check=True
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return min(results, key=lambda r: r["import_s"] + r["construct_s"])
+
+
+def main():
+    budget = float(os.getenv("STARTUP_BUDGET_SECONDS", "1.0"))
+    result = measure(warm="--warm" in sys.argv)
+    result["startup_s"] = result["import_s"] + result["construct_s"]
+    result["budget_s"] = budget
+    result["ok"] = result["startup_s"] <= budget and not result["heavy_modules"]
+    print(json.dumps(result, indent=2))
+    # non-zero exit so CI can catch startup regressions
+    sys.exit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
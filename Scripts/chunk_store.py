@@ -0,0 +1,114 @@
+import os
+import json
+import shutil
+import numpy as np
+from pathlib import Path
+
+
+class ChunkStore:
+    """Memory-mapped chunk text and page ids for one filing.
+
+    Layout of the `<pdf>.chunks/` directory:
+        pages.npy       int32 page number of each chunk
+        offsets.npy     int64 byte offsets of each chunk in text.npy (N + 1 entries)
+        text.npy        uint8 UTF-8 blob of all chunk texts
+        page_index.npy  int64 first chunk of each page number (chunks are stored in page order)
+        overlaps.npy    int32 leading characters each chunk repeats from the previous one (optional;
+                        without it every chunk but a page's first repeats the same `overlap`)
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.pages = np.load(self.path / "pages.npy", mmap_mode="r")
+        self.offsets = np.load(self.path / "offsets.npy", mmap_mode="r")
+        self.text_blob = np.load(self.path / "text.npy", mmap_mode="r")
+        self.page_index = np.load(self.path / "page_index.npy", mmap_mode="r")
+        overlaps = self.path / "overlaps.npy"
+        self.overlaps = np.load(overlaps, mmap_mode="r") if overlaps.exists() else None
+
+    @staticmethod
+    def path_for(meta_path):
+        meta_path = Path(meta_path)
+        return meta_path.with_name(meta_path.name[:-len(".meta.json")] + ".chunks")
+
+    @classmethod
+    def write(cls, path, records):
+        path = Path(path)
+        encoded = [r["text"].encode("utf-8") for r in records]
+        pages = np.asarray([r["page"] for r in records], dtype=np.int32)
+        if len(pages) and np.any(np.diff(pages) < 0):
+            raise ValueError("Chunk records must be ordered by page.")
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+        max_page = int(pages.max()) if len(pages) else 0
+        page_index = np.searchsorted(pages, np.arange(max_page + 2), side="left").astype(np.int64)
+
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        np.save(tmp / "pages.npy", pages)
+        np.save(tmp / "offsets.npy", offsets)
+        np.save(tmp / "text.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        np.save(tmp / "page_index.npy", page_index)
+        if records and "overlap" in records[0]:
+            np.save(tmp / "overlaps.npy", np.asarray([r["overlap"] for r in records], dtype=np.int32))
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+        return cls(path)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def text(self, i):
+        return self.text_blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def page(self, i):
+        return int(self.pages[i])
+
+    def page_chunk_range(self, page):
+        if page < 0 or page + 1 >= len(self.page_index):
+            return 0, 0
+        return int(self.page_index[page]), int(self.page_index[page + 1])
+
+    def page_chunks(self, page):
+        start, end = self.page_chunk_range(page)
+        return [self.text(i) for i in range(start, end)]
+
+    def _page_overlaps(self, page, overlap):
+        start, end = self.page_chunk_range(page)
+        if self.overlaps is not None:
+            return [int(o) for o in self.overlaps[start:end]]
+        return [0] + [overlap] * (end - start - 1) if end > start else []
+
+    def page_text(self, page, overlap=0):
+        """Rebuild a page from its chunks, dropping the characters each chunk repeats.
+
+        Stores written with per-chunk overlaps use those; `overlap` applies to stores without them.
+        """
+        chunks = self.page_chunks(page)
+        return "".join(c[o:] for c, o in zip(chunks, self._page_overlaps(page, overlap)))
+
+    def page_repeated_chars(self, page, overlap=0):
+        """Characters page_text drops from the page's chunks."""
+        return sum(self._page_overlaps(page, overlap))
+
+
+def load_meta_and_store(meta_path):
+    """Read a filing's meta header and chunk store, migrating legacy JSON `chunks` on the fly."""
+    meta_path = Path(meta_path)
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    store_path = ChunkStore.path_for(meta_path)
+    if "chunks" in meta:
+        store = ChunkStore.write(store_path, meta.pop("chunks"))
+        write_meta(meta_path, meta)
+        return meta, store
+    return meta, ChunkStore(store_path)
+
+
+def write_meta(meta_path, meta):
+    meta_path = Path(meta_path)
+    tmp = meta_path.with_name(meta_path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, meta_path)
@@ -0,0 +1,71 @@
+import os
+import math
+from loguru import logger
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English prose; Bedrock does not expose a local tokenizer
+    return math.ceil(len(text) / 4)
+
+
+class ContextBuilder:
+    """Assemble retrieved pages into the LLM context under a token budget.
+
+    Pages hit by several sub-queries are kept once with their best score, and
+    pages are added in score order until the budget is spent.
+    """
+
+    def __init__(self, token_budget=None, count_tokens=estimate_tokens, min_partial_tokens=200):
+        self.token_budget = token_budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", "12000"))
+        self.count_tokens = count_tokens
+        self.min_partial_tokens = min_partial_tokens
+
+    @staticmethod
+    def format_page(page, text):
+        return f"<PAGENUMBER>{page}</PAGENUMBER>\n<PAGETEXT>{text}</PAGETEXT>\n\n\n"
+
+    def build(self, passages):
+        """passages: dicts with pdf_name, page, score, text and raw_chars (length of the naive chunk join)."""
+        naive_tokens = sum(
+            self.count_tokens(self.format_page(p["page"], "")) + math.ceil(p["raw_chars"] / 4)
+            for p in passages
+        )
+        best = {}
+        for p in passages:
+            key = (p["pdf_name"], p["page"])
+            if key not in best or p["score"] > best[key]["score"]:
+                best[key] = p
+        ranked = sorted(best.values(), key=lambda p: p["score"], reverse=True)
+
+        context = ""
+        used = 0
+        included = []
+        for p in ranked:
+            block = self.format_page(p["page"], p["text"])
+            tokens = self.count_tokens(block)
+            remaining = self.token_budget - used
+            if tokens > remaining:
+                if remaining >= self.min_partial_tokens:
+                    overhead = self.count_tokens(self.format_page(p["page"], ""))
+                    block = self.format_page(p["page"], p["text"][:(remaining - overhead) * 4])
+                    context += block
+                    used += self.count_tokens(block)
+                    included.append((p["pdf_name"], p["page"]))
+                break
+            context += block
+            used += tokens
+            included.append((p["pdf_name"], p["page"]))
+
+        stats = {
+            "passages": len(passages),
+            "unique_pages": len(ranked),
+            "included_pages": len(included),
+            "tokens": used,
+            "naive_tokens": naive_tokens,
+            "tokens_saved": max(naive_tokens - used, 0),
+        }
+        logger.info(
+            f"Context: {stats['included_pages']}/{stats['unique_pages']} pages, "
+            f"{used} tokens ({stats['tokens_saved']} saved vs. {naive_tokens})"
+        )
+        return context, stats
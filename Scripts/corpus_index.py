@@ -0,0 +1,205 @@
+import os
+import json
+import numpy as np
+from pathlib import Path
+from loguru import logger
+from chunk_store import load_meta_and_store
+from vector_index import VectorIndex
+
+
+class CorpusIndex:
+    """Single vector index over every filing, with company/year/page attributes per vector.
+
+    Vectors are stored grouped by filing, so a (company, year) filter maps to a
+    contiguous id range and filtered search never scans other filings.
+    """
+
+    def __init__(self, index_dir, index_type=None, nlist=None, nprobe=None, hnsw_m=None, ef_search=None, ef_construction=None):
+        self.index_dir = Path(index_dir)
+        self.idx_path = self.index_dir / "corpus.index"
+        self.meta_path = self.index_dir / "corpus.meta.json"
+        self.pages_path = self.index_dir / "corpus.pages.npy"
+        self.index_type = (index_type or os.getenv("CORPUS_INDEX_TYPE", "flat")).lower()
+        self.nlist = nlist or int(os.getenv("CORPUS_NLIST", "256"))
+        self.nprobe = nprobe or int(os.getenv("CORPUS_NPROBE", "16"))
+        self.hnsw_m = hnsw_m or int(os.getenv("CORPUS_HNSW_M", "32"))
+        self.ef_search = ef_search or int(os.getenv("CORPUS_EF_SEARCH", "64"))
+        self.ef_construction = ef_construction or int(os.getenv("CORPUS_EF_CONSTRUCTION", "200"))
+        self.index = None
+        self.meta = None
+        self.pages = None
+        self._ranges = {}
+        self._starts = None
+
+    @staticmethod
+    def parse_pdf_name(pdf_name):
+        stem = Path(pdf_name).stem
+        company, _, year = stem.rpartition("_")
+        return company.upper(), year
+
+    def _source_metas(self):
+        return sorted(p for p in self.index_dir.glob("*.meta.json") if p != self.meta_path)
+
+    def is_stale(self):
+        if not all(p.exists() for p in (self.idx_path, self.meta_path, self.pages_path)):
+            return True
+        built = self.meta_path.stat().st_mtime_ns
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("index_type") != self.index_type:
+            return True
+        # filings build() skipped count as covered; rebuilding them touches their meta, which makes us stale
+        docs = {d["pdf_name"] for d in meta["docs"]} | set(meta.get("skipped", []))
+        sources = self._source_metas()
+        if {p.name[:-len(".meta.json")] for p in sources} != docs:
+            return True
+        return any(p.stat().st_mtime_ns > built for p in sources)
+
+    def _new_index(self, dim, n):
+        import faiss
+        if self.index_type == "flat":
+            return faiss.IndexFlatIP(dim)
+        if self.index_type == "ivf":
+            nlist = max(1, min(self.nlist, n // 39))
+            return faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.ef_construction
+            return index
+        raise ValueError(f"Unknown corpus index type '{self.index_type}'. Use flat, ivf or hnsw.")
+
+    def build(self):
+        """Merge all per-filing indexes in index_dir into one corpus index (no re-embedding).
+
+        Compressed per-filing indexes contribute their stored exact vectors when
+        they have them, otherwise their decoded approximations.
+        """
+        import faiss
+        vectors, pages, docs, skipped = [], [], [], []
+        model_name = None
+        start = 0
+        for meta_path in self._source_metas():
+            pdf_name = meta_path.name[:-len(".meta.json")]
+            idx_path = self.index_dir / f"{pdf_name}.index"
+            if not idx_path.exists():
+                skipped.append(pdf_name)
+                continue
+            meta, store = load_meta_and_store(meta_path)
+            if model_name and meta.get("model_name") != model_name:
+                logger.warning(f"Skipping {pdf_name}: embedded with {meta.get('model_name')}, corpus uses {model_name}")
+                skipped.append(pdf_name)
+                continue
+            model_name = meta.get("model_name")
+            src = VectorIndex.read(idx_path, meta.get("index_params"))
+            vectors.append(src.vectors_for_export())
+            pages.append(np.asarray(store.pages))
+            company, year = self.parse_pdf_name(pdf_name)
+            docs.append({"pdf_name": pdf_name, "company": company, "year": year, "start": start, "end": start + src.ntotal})
+            start += src.ntotal
+
+        if not docs:
+            raise ValueError(f"No per-filing indexes found in {self.index_dir}.")
+
+        embs = np.ascontiguousarray(np.concatenate(vectors), dtype=np.float32)
+        index = self._new_index(embs.shape[1], len(embs))
+        if not index.is_trained:
+            index.train(embs)
+        index.add(embs)
+        faiss.write_index(index, str(self.idx_path))
+        np.save(self.pages_path, np.concatenate(pages).astype(np.int32))
+        meta = {
+            "model_name": model_name,
+            "dim": int(embs.shape[1]),
+            "num_vectors": int(len(embs)),
+            "index_type": self.index_type,
+            "docs": docs,
+            "skipped": skipped,
+        }
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        self._set(index, meta)
+        return {"status": "ok", "vectors": len(embs), "docs": len(docs), "index_type": self.index_type}
+
+    def load(self):
+        import faiss
+        if not self.idx_path.exists() or not self.meta_path.exists():
+            raise FileNotFoundError(f"Corpus index not found in '{self.index_dir}'. Build it first.")
+        index = faiss.read_index(str(self.idx_path))
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self._set(index, meta)
+        return self
+
+    def _set(self, index, meta):
+        self.index = index
+        self.meta = meta
+        self.pages = np.load(self.pages_path, mmap_mode="r")
+        self._ranges = {(d["company"], str(d["year"])): d for d in meta["docs"]}
+        self._starts = np.asarray([d["start"] for d in meta["docs"]], dtype=np.int64)
+
+    def _filter_docs(self, where):
+        if not where:
+            return None
+        keys = [(c.upper(), str(y)) for c, y in where]
+        return [self._ranges[key] for key in keys if key in self._ranges]
+
+    def _params(self, docs):
+        import faiss
+        sel = None
+        if docs:
+            if len(docs) == 1:
+                sel = faiss.IDSelectorRange(docs[0]["start"], docs[0]["end"])
+            else:
+                ids = np.concatenate([np.arange(d["start"], d["end"], dtype=np.int64) for d in docs])
+                sel = faiss.IDSelectorBatch(ids)
+        if isinstance(self.index, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=sel, nprobe=self.nprobe), sel
+        if isinstance(self.index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=sel, efSearch=self.ef_search), sel
+        return (faiss.SearchParameters(sel=sel) if sel is not None else None), sel
+
+    def search(self, q_embs, top_k=5, where=None):
+        """Search every query in q_embs, restricted to the (company, year) pairs in `where`."""
+        q_embs = np.ascontiguousarray(q_embs, dtype=np.float32)
+        docs = self._filter_docs(where)
+        if docs == []:
+            return [[] for _ in range(len(q_embs))]
+        # sel must stay referenced until the search returns
+        params, sel = self._params(docs)
+        k = min(top_k, self.index.ntotal)
+        if params is None:
+            scores, ids = self.index.search(q_embs, k)
+        else:
+            scores, ids = self.index.search(q_embs, k, params=params)
+        return [self._hits(s, i) for s, i in zip(scores, ids)]
+
+    def search_batch(self, q_embs, wheres, top_k=5):
+        """Search each query with its own filter; queries sharing a filter go through one faiss call."""
+        q_embs = np.ascontiguousarray(q_embs, dtype=np.float32)
+        groups = {}
+        for row, where in enumerate(wheres):
+            key = tuple(sorted((c.upper(), str(y)) for c, y in where)) if where else ()
+            groups.setdefault(key, []).append(row)
+        results = [None] * len(q_embs)
+        for key, rows in groups.items():
+            for row, hits in zip(rows, self.search(q_embs[rows], top_k=top_k, where=list(key) or None)):
+                results[row] = hits
+        return results
+
+    def _hits(self, scores, ids):
+        hits = []
+        for score, i in zip(scores.tolist(), ids.tolist()):
+            if i < 0:
+                continue
+            doc = self._doc_for(i)
+            hits.append({
+                "pdf_name": doc["pdf_name"],
+                "company": doc["company"],
+                "year": doc["year"],
+                "page": int(self.pages[i]),
+                "score": score,
+            })
+        return hits
+
+    def _doc_for(self, vector_id):
+        return self.meta["docs"][int(np.searchsorted(self._starts, vector_id, side="right")) - 1]
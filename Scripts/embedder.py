@@ -0,0 +1,97 @@
+import os
+import numpy as np
+
+BACKENDS = ("torch", "int8", "onnx")
+
+
+class Embedder:
+    """Sentence embedding behind one encode() interface, with selectable CPU backend.
+
+    Backends:
+        torch  SentenceTransformer in full precision (the original behaviour)
+        int8   the same model with Linear layers dynamically quantized to int8
+        onnx   SentenceTransformer on ONNX Runtime (needs sentence-transformers[onnx]);
+               EMBED_ONNX_FILE picks a pre-quantized export, e.g. onnx/model_qint8_avx512_vnni.onnx
+
+    encode() sorts texts by token length and packs batches up to max_batch_tokens,
+    so short chunks are not padded to the length of the longest one.
+    """
+
+    def __init__(self, model_name, backend=None, max_batch_tokens=None, onnx_file=None):
+        self.model_name = model_name
+        self.backend = (backend or os.getenv("EMBED_BACKEND", "torch")).lower()
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{self.backend}'. Use one of: {', '.join(BACKENDS)}.")
+        self.onnx_file = onnx_file or os.getenv("EMBED_ONNX_FILE")
+        self.max_batch_tokens = max_batch_tokens or int(os.getenv("EMBED_MAX_BATCH_TOKENS", "16384"))
+        self.model = self._load()
+
+    @staticmethod
+    def embedding_id(model_name, backend=None, onnx_file=None):
+        """Identifier for vectors produced by a model/backend pair; stored in index meta and cache keys."""
+        backend = (backend or os.getenv("EMBED_BACKEND", "torch")).lower()
+        if backend == "torch":
+            return model_name
+        if backend == "onnx":
+            onnx_file = onnx_file or os.getenv("EMBED_ONNX_FILE")
+            return f"{model_name}@onnx:{onnx_file}" if onnx_file else f"{model_name}@onnx"
+        return f"{model_name}@{backend}"
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+        if self.backend == "torch":
+            return SentenceTransformer(self.model_name)
+        if self.backend == "int8":
+            import torch
+            model = SentenceTransformer(self.model_name, device="cpu")
+            return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        try:
+            model_kwargs = {"file_name": self.onnx_file} if self.onnx_file else None
+            return SentenceTransformer(self.model_name, backend="onnx", model_kwargs=model_kwargs)
+        except ImportError as e:
+            raise ImportError("EMBED_BACKEND=onnx requires `pip install sentence-transformers[onnx]`.") from e
+
+    def get_sentence_embedding_dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def _token_lengths(self, texts):
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            return np.asarray([max(1, len(t) // 4) for t in texts])
+        limit = getattr(self.model, "max_seq_length", None) or 512
+        ids = tokenizer(list(texts), add_special_tokens=True, truncation=True, max_length=limit)["input_ids"]
+        return np.asarray([len(i) for i in ids])
+
+    def _batches(self, lengths, max_batch_size=None):
+        order = np.argsort(-lengths, kind="stable")
+        batch = []
+        for i in order:
+            # sorted longest first, so the first item of a batch sets its padded length
+            padded = lengths[batch[0]] if batch else lengths[i]
+            if batch and ((len(batch) + 1) * padded > self.max_batch_tokens or len(batch) == max_batch_size):
+                yield batch
+                batch = []
+            batch.append(i)
+        if batch:
+            yield batch
+
+    def encode(self, texts, batch_size=None, normalize_embeddings=False, **kwargs):
+        texts = list(texts)
+        if len(texts) <= 1:
+            return np.asarray(
+                self.model.encode(texts, normalize_embeddings=normalize_embeddings, convert_to_numpy=True, **kwargs),
+                dtype=np.float32
+            ).reshape(len(texts), -1)
+        out = None
+        for batch in self._batches(self._token_lengths(texts), max_batch_size=batch_size):
+            embs = self.model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                normalize_embeddings=normalize_embeddings,
+                convert_to_numpy=True,
+                **kwargs
+            )
+            if out is None:
+                out = np.empty((len(texts), embs.shape[1]), dtype=np.float32)
+            out[batch] = embs
+        return out
@@ -0,0 +1,136 @@
+import os
+import time
+import shutil
+import hashlib
+import threading
+import numpy as np
+from pathlib import Path
+from metrics import metrics
+
+
+def text_digest(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """On-disk cache of chunk embeddings keyed by (model name, chunk text hash).
+
+    Each model gets its own directory of append-only shards: a uint8 (N, 16)
+    array of text digests and a float32 (N, dim) array of vectors, both .npy.
+    Compaction, run once there are more than max_shards shards or they exceed
+    max_bytes, merges them oldest entry first, evicts the oldest entries over
+    max_bytes (0 = no limit) and deletes the directories of other models.
+    """
+
+    def __init__(self, cache_dir, model_name, max_shards=64, max_bytes=1024 * 1024 * 1024):
+        safe = (model_name or "default").replace("/", "__")
+        self.root = Path(cache_dir)
+        self.dir = self.root / safe
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_shards = max_shards
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._shards = []
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        self._rows.clear()
+        self._shards = []
+        self._bytes = 0
+        for keys_path in sorted(self.dir.glob("shard_*.keys.npy")):
+            vecs_path = keys_path.with_name(keys_path.name.replace(".keys.npy", ".vecs.npy"))
+            if not vecs_path.exists():
+                continue
+            keys = np.load(keys_path)
+            vecs = np.load(vecs_path, mmap_mode="r")
+            shard = len(self._shards)
+            self._shards.append((keys_path, vecs_path, vecs))
+            self._bytes += keys.nbytes + vecs.nbytes
+            for row, key in enumerate(keys):
+                self._rows[key.tobytes()] = (shard, row)
+        if self._over_limit():
+            self._compact()
+
+    def _over_limit(self):
+        return len(self._shards) > self.max_shards or (self.max_bytes and self._bytes > self.max_bytes)
+
+    def _save_shard(self, keys, vecs):
+        name = f"shard_{time.time_ns()}_{os.getpid()}"
+        keys_path = self.dir / f"{name}.keys.npy"
+        vecs_path = self.dir / f"{name}.vecs.npy"
+        # vectors first, keys last: a shard is only visible once its keys file exists
+        for path, arr in ((vecs_path, vecs), (keys_path, keys)):
+            tmp = path.with_name(path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp, path)
+        shard = len(self._shards)
+        self._shards.append((keys_path, vecs_path, np.load(vecs_path, mmap_mode="r")))
+        self._bytes += keys.nbytes + vecs.nbytes
+        for row, key in enumerate(keys):
+            self._rows[key.tobytes()] = (shard, row)
+
+    def _compact(self):
+        # vectors from another model (or backend) can never be hits here
+        for other in self.root.iterdir():
+            if other.is_dir() and other != self.dir:
+                shutil.rmtree(other, ignore_errors=True)
+        old = list(self._shards)
+        # shards are named by creation time, so (shard, row) order is oldest first
+        rows = sorted(self._rows.items(), key=lambda item: item[1])
+        if self.max_bytes and rows:
+            row_bytes = 16 + 4 * old[0][2].shape[1]
+            rows = rows[max(0, len(rows) - self.max_bytes // row_bytes):]
+        self._shards = []
+        self._rows.clear()
+        self._bytes = 0
+        if rows:
+            keys = np.frombuffer(b"".join(key for key, _ in rows), dtype=np.uint8).reshape(-1, 16)
+            vecs = np.stack([old[s][2][r] for _, (s, r) in rows]).astype(np.float32)
+            self._save_shard(keys, vecs)
+        for keys_path, vecs_path, _ in old:
+            keys_path.unlink(missing_ok=True)
+            vecs_path.unlink(missing_ok=True)
+
+    def encode(self, texts, encode_fn):
+        """Return float32 embeddings for texts, calling encode_fn only on texts not cached yet."""
+        digests = [text_digest(t) for t in texts]
+        with self._lock:
+            # copy hits now: a compaction triggered by another writer may evict them
+            found = {}
+            missing = {}
+            for i, d in enumerate(digests):
+                if d in self._rows:
+                    if d not in found:
+                        s, r = self._rows[d]
+                        found[d] = np.array(self._shards[s][2][r], dtype=np.float32)
+                elif d not in missing:
+                    missing[d] = i
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        metrics.count("embedding_cache.texts", len(texts) - len(missing), result="hit")
+        metrics.count("embedding_cache.texts", len(missing), result="miss")
+        if missing:
+            new = np.asarray(encode_fn([texts[i] for i in missing.values()]), dtype=np.float32)
+            keys = np.frombuffer(b"".join(missing.keys()), dtype=np.uint8).reshape(-1, 16)
+            found.update(zip(missing, new))
+            with self._lock:
+                self._save_shard(keys, new)
+                if self._over_limit():
+                    self._compact()
+        return np.stack([found[d] for d in digests])
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._rows),
+                "shards": len(self._shards),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,260 @@
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from collections import Counter
+from query_planner import QueryPlanner
+
+SEGMENTS = {
+    "MSFT": ["Productivity and Business Processes", "Intelligent Cloud", "More Personal Computing"],
+    "GOOGL": ["Google Services", "Google Cloud", "Other Bets"],
+    "NVDA": ["Compute & Networking", "Graphics", "Data Center", "Gaming", "Professional Visualization", "Automotive", "OEM and Other"],
+}
+METRIC_NAMES = {
+    "total_revenue": "total revenue",
+    "operating_income": "operating income",
+    "net_income": "net income",
+    "segment_revenue": "{segment} segment revenue",
+    "segment_operating_income": "{segment} segment operating income",
+}
+
+_value = r"\(?\$?\s?\(?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?\)?(?![\d.,]*\s*%)"
+_values = rf"(?P<values>{_value}(?:\s+{_value}){{1,5}})"
+_metric_labels = {
+    "total_revenue": r"total\s+(?:net\s+)?revenues?|total\s+net\s+sales|net\s+revenues?|revenues?",
+    "operating_income": r"(?:total\s+)?income\s+from\s+operations|operating\s+income(?:\s+\(loss\))?",
+    "net_income": r"net\s+income(?:\s+\(loss\))?",
+}
+_section = re.compile(
+    r"\b(?P<total_revenue>revenues?|net\s+sales)\b|\b(?P<operating_income>operating\s+income|income\s+from\s+operations)\b|"
+    r"\b(?P<net_income>net\s+income)\b", re.I
+)
+_statement = re.compile(r"income\s+statements?|statements?\s+of\s+(?:income|operations)", re.I)
+_year = re.compile(r"\b((?:19|20)\d{2})\b")
+_unit = re.compile(r"\bin\s+(millions|billions|thousands)\b", re.I)
+_header_gap = re.compile(r"\$|\d,\d{3}")
+
+
+def _row_pattern(segments):
+    alternatives = [rf"(?P<m_{name}>{pattern})" for name, pattern in _metric_labels.items()]
+    if segments:
+        alternatives.append(r"(?P<segment>" + "|".join(re.escape(s).replace(r"\ ", r"\s+") for s in segments) + r")")
+    alternatives.append(r"(?P<total>total)")
+    return re.compile(r"(?<![A-Za-z])(?:" + "|".join(alternatives) + r")\s*:?\s+" + _values, re.I)
+
+
+def _parse_value(text):
+    negative = "(" in text
+    number = float(re.sub(r"[^\d.]", "", text))
+    return -number if negative else number
+
+
+def _header_years(text, end, window=1200):
+    """Years of the nearest column header before `end`: two or more years separated only by short date text."""
+    matches = list(_year.finditer(text, max(0, end - window), end))
+    cluster = []
+    for match in reversed(matches):
+        if cluster:
+            gap = text[match.end():cluster[0].start()]
+            if len(gap) > 20 or _header_gap.search(gap):
+                if len(cluster) >= 2:
+                    break
+                cluster = []
+        cluster.insert(0, match)
+    years = [int(m.group(1)) for m in cluster]
+    if len(years) < 2 or len(set(years)) != len(years):
+        return None, None
+    return years, text[cluster[0].start():cluster[-1].end()]
+
+
+def _section_before(text, start, window=1200):
+    last = None
+    for match in _section.finditer(text, max(0, start - window), start):
+        last = match.lastgroup
+    return last
+
+
+def extract_facts(pages, segments=()):
+    """Parse income statement and segment table rows from {page: text} into (metric, fiscal_year) facts.
+
+    A row is a known label followed by two or more numbers. Column years come
+    from the nearest year header above the row, so ascending, descending and
+    "$ Change"/"% Change" layouts all map correctly. Bare "Total" rows and
+    segment rows take their metric from the nearest section heading above them
+    (Revenue, Operating income, ...).
+    """
+    pattern = _row_pattern(segments)
+    candidates = {}
+    for page, text in pages.items():
+        unit_match = _unit.search(text)
+        unit = unit_match.group(1).lower() if unit_match else None
+        statement = bool(_statement.search(text))
+        for match in pattern.finditer(text):
+            raw = re.findall(_value, match.group("values"))
+            if all(re.fullmatch(r"(?:19|20)\d{2}", v.strip()) for v in raw):
+                continue
+            years, header = _header_years(text, match.start())
+            if years is None or len(raw) < len(years):
+                continue
+            label = next(v for k, v in match.groupdict().items() if k != "values" and v)
+            rank = 3
+            if match.group("segment"):
+                # an unlabeled segment table is the revenue breakdown
+                section = _section_before(text, match.start()) or "total_revenue"
+                if section not in ("total_revenue", "operating_income"):
+                    continue
+                segment = next(s for s in segments if re.fullmatch(re.escape(s).replace(r"\ ", r"\s+"), label, re.I))
+                metric = f"segment_{'revenue' if section == 'total_revenue' else 'operating_income'}:{segment}"
+            elif match.group("total"):
+                metric = _section_before(text, match.start())
+                if metric is None:
+                    continue
+            else:
+                metric = next(name for name in _metric_labels if match.group(f"m_{name}"))
+                # "Intelligent Cloud Revenue $87,907 ...", "Total cost of revenue 65,863 ..." are not the company total
+                before = text[max(0, match.start() - 40):match.start()].rstrip().lower()
+                if metric == "total_revenue" and (
+                    any(before.endswith(s.lower()) for s in segments) or re.search(r"\b(of|unearned|deferred)$", before)
+                ):
+                    continue
+                rank = 1 if re.match(r"total|net", label, re.I) else 2
+            excerpt = f"{header} ... {match.group(0)}"
+            for col, (year, value) in enumerate(zip(years, raw)):
+                candidates.setdefault((metric, year), []).append({
+                    "metric": metric, "fiscal_year": year, "value": _parse_value(value), "unit": unit,
+                    "label": re.sub(r"\s+", " ", label), "excerpt": excerpt, "page": page, "col": col, "rank": rank,
+                    "statement": statement,
+                })
+
+    facts = []
+    for (metric, year), found in candidates.items():
+        # income statement rows first, then "Total revenue" over "Revenue" over "Total"/segment rows,
+        # then the value most tables agree on
+        counts = Counter(f["value"] for f in found)
+        best = min(found, key=lambda f: (not f["statement"], f["rank"], -counts[f["value"]], f["page"]))
+        facts.append(best)
+    return facts
+
+
+class FactStore:
+    """SQLite table of (company, fiscal_year, metric) -> value with the page and row it was read from."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS facts ("
+            "company TEXT, fiscal_year INTEGER, metric TEXT, value REAL, unit TEXT, label TEXT, excerpt TEXT, "
+            "pdf_name TEXT, page INTEGER, col INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS facts_lookup ON facts(company, fiscal_year, metric)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS filings (pdf_name TEXT PRIMARY KEY, version INTEGER, facts INTEGER)")
+        self._conn.commit()
+        self._versions = dict(self._conn.execute("SELECT pdf_name, version FROM filings").fetchall())
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, pdf_name):
+        return self._versions.get(pdf_name)
+
+    def ingest(self, pdf_name, company, pages, version):
+        """Replace the facts of one filing with those parsed from its {page: text}."""
+        facts = extract_facts(pages, SEGMENTS.get(company, ()))
+        with self._lock:
+            self._conn.execute("DELETE FROM facts WHERE pdf_name = ?", (pdf_name,))
+            self._conn.executemany(
+                "INSERT INTO facts (company, fiscal_year, metric, value, unit, label, excerpt, pdf_name, page, col) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(company, f["fiscal_year"], f["metric"], f["value"], f["unit"], f["label"], f["excerpt"], pdf_name, f["page"], f["col"])
+                 for f in facts]
+            )
+            self._conn.execute("INSERT OR REPLACE INTO filings (pdf_name, version, facts) VALUES (?, ?, ?)", (pdf_name, version, len(facts)))
+            self._conn.commit()
+            self._versions[pdf_name] = version
+        return len(facts)
+
+    def lookup(self, company, fiscal_year, metric):
+        """Best fact for the key: prefer the filing where the year is the primary column, then the newest filing."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, unit, label, excerpt, pdf_name, page FROM facts WHERE company = ? AND fiscal_year = ? AND metric = ? "
+                "ORDER BY col, pdf_name DESC LIMIT 1",
+                (company, int(fiscal_year), metric)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        keys = ("value", "unit", "label", "excerpt", "pdf_name", "page")
+        return dict(zip(keys, row))
+
+    def stats(self):
+        with self._lock:
+            facts = self._conn.execute("SELECT COUNT(*) FROM facts").fetchone()[0]
+            total = self.hits + self.misses
+            return {"filings": len(self._versions), "facts": facts, "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / total if total else 0.0}
+
+
+_company_words = [re.escape(a) for aliases in QueryPlanner.ALIASES.values() for a in aliases]
+_not_direct = re.compile(
+    r"\b(why|how\s+(?:did|has|have|does|do)|grow\w*|growth|chang\w*|increas\w*|decreas\w*|declin\w*|percent\w*|ratio|"
+    r"margin|compar\w*|versus|vs\.?|trend\w*|explain\w*|driv\w*|impact\w*|higher|highest|lower|lowest|rank\w*|"
+    r"difference|share\s+of|proportion|forecast\w*|guidance|outlook|each|all)\b|%", re.I
+)
+# revenue of a product, region, period or balance-sheet item, not the annual total
+_qualified_revenue = re.compile(
+    r"\bcosts?\s+of\s+(?:total\s+)?(?:revenues?|sales)\b|\b(?:unearned|deferred)\s+revenues?\b|"
+    r"\b(?:revenues?|sales)\s+(?:from|by|per|in\s+(?:the\s+)?(?:u\.?s\.?|united\s+states|china|europe|asia))\b|"
+    r"\bq[1-4]\b|\bquarter\w*|\bhalf\b|\bh[12]\b|\bmonth\w*",
+    re.I
+)
+_revenue_word = re.compile(r"\b(?:(?:total|net)\s+)*(?:revenues?|sales)\b", re.I)
+_plain_before = re.compile(
+    r"(?:^|\b(?:the|its|their|what|much|was|were|is|of|and|did|report\w*|consolidated|overall|annual|full|year|"
+    r"fiscal|company|generate\w*|earn\w*|\d{4}|fy\s?\d{2,4})|['’]s|s['’]|[?:,])\s*$",
+    re.I
+)
+_query_metrics = {
+    "operating_income": re.compile(r"\boperating\s+income\b|\bincome\s+from\s+operations\b", re.I),
+    "net_income": re.compile(r"\bnet\s+(income|earnings)\b", re.I),
+    "total_revenue": re.compile(r"\b(total\s+)?(net\s+)?revenues?\b|\bnet\s+sales\b|\bsales\b", re.I),
+}
+
+
+def metric_for_query(query, company):
+    """The single metric a direct question asks about for `company`, or None if it is not a plain lookup."""
+    if _not_direct.search(query) or _qualified_revenue.search(query):
+        return None
+    found = {name for name, pattern in _query_metrics.items() if pattern.search(query)}
+    segments = [s for s in SEGMENTS.get(company, ()) if re.search(r"\b" + re.escape(s) + r"\b", query, re.I)]
+    if len(segments) > 1:
+        return None
+    for match in _revenue_word.finditer(query):
+        before = query[:match.start()]
+        if segments and re.search(re.escape(segments[0]) + r"(?:\s+segment)?\s*$", before, re.I):
+            continue
+        if not _plain_before.search(before) and not re.search(r"\b(" + "|".join(_company_words) + r")\s*$", before, re.I):
+            # "Azure revenue", "advertising revenue": a sub-line the store does not hold
+            return None
+    if segments:
+        if found <= {"total_revenue"}:
+            return f"segment_revenue:{segments[0]}"
+        if found == {"operating_income"}:
+            return f"segment_operating_income:{segments[0]}"
+        return None
+    return found.pop() if len(found) == 1 else None
+
+
+def describe_metric(metric):
+    name, _, segment = metric.partition(":")
+    return METRIC_NAMES[name].format(segment=segment)
+
+
+def format_value(value, unit):
+    amount = f"{abs(value):,.0f}" if float(value).is_integer() else f"{abs(value):,.2f}"
+    text = f"${amount}" + (f" {unit.rstrip('s')}" if unit else "")
+    return f"-{text}" if value < 0 else text
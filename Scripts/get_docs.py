@@ -1,24 +1,78 @@
 import os
+import json
+import threading
 import requests
 from loguru import logger
-from sec_api import QueryApi
 from dotenv import load_dotenv
+from urllib3.util.retry import Retry
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 load_dotenv()
 
+class IncompleteDownload(IOError):
+    """The response body ended before Content-Length bytes arrived; the .part file is kept for resume."""
+
 class ExtractDocuments:
     def __init__(self):
         self.API_KEY = os.getenv("API_KEY")
         self.FORM_TYPE = "10-K"
         self.START_YEAR = 2022
         self.END_YEAR = 2024
-        self.query_api = QueryApi(self.API_KEY)
+        self.BASE_URL = os.getenv("SEC_API_BASE_URL", "https://api.sec-api.io").rstrip("/")
         self.COMPANIES = {
             "GOOGL": "1652044",
             "MSFT": "789019",
             "NVDA": "1045810"
         }
         os.makedirs("temp", exist_ok=True)
+        self.workers = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+        self.session = self._build_session(self.workers)
+        self.manifest_path = os.path.join("temp", "manifest.json")
+        self._manifest_lock = threading.Lock()
+        self.manifest = self._load_manifest()
+
+    def _build_session(self, pool_size):
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            # the Query API search is a read-only POST, so it is safe to retry
+            allowed_methods=["GET", "POST"]
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(pool_size, 4), max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _mark_complete(self, accession, pdf_name, size):
+        with self._manifest_lock:
+            self.manifest[accession] = {"pdf": pdf_name, "bytes": size}
+            tmp = self.manifest_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.manifest, f, indent=2)
+            os.replace(tmp, self.manifest_path)
+
+    @staticmethod
+    def _looks_complete(path):
+        # a PDF ends with an %%EOF marker; truncated downloads do not
+        with open(path, "rb") as f:
+            f.seek(max(os.path.getsize(path) - 1024, 0))
+            return b"%%EOF" in f.read()
+
+    def _query(self, query):
+        """POST a search to the sec-api Query API through the pooled, retrying session."""
+        r = self.session.post(self.BASE_URL, params={"token": self.API_KEY}, json=query, timeout=(10, 60))
+        r.raise_for_status()
+        return r.json()
 
     def get_filings(self, cik, form_type, start_year, end_year):
         search_expr = f'cik:"{cik}" AND formType:"{form_type}" AND filedAt:[{start_year}-01-01 TO {end_year}-12-31]'
@@ -27,7 +81,7 @@ class ExtractDocuments:
         page_size = 100
         total = 1
         while start < total:
-            resp = self.query_api.get_filings({
+            resp = self._query({
                 "query": search_expr,
                 "from": start,
                 "size": page_size,
@@ -40,33 +94,88 @@ class ExtractDocuments:
         return filings
 
     def download_pdf(self, api_key, filing_url, out_path):
-        pdf_api_url = "https://api.sec-api.io/filing-reader"
+        """Download to <out_path>.part, resuming a previous partial file with a Range request, then rename."""
+        pdf_api_url = f"{self.BASE_URL}/filing-reader"
         params = {"token": api_key, "url": filing_url}
-        with requests.get(pdf_api_url, params=params, stream=True) as r:
+        part_path = out_path + ".part"
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with self.session.get(pdf_api_url, params=params, headers=headers, stream=True, timeout=(10, 120)) as r:
+            if r.status_code == 416:
+                os.remove(part_path)
+                return self.download_pdf(api_key, filing_url, out_path)
             r.raise_for_status()
-            with open(out_path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
+            if r.status_code != 206:
+                offset = 0
+            expected = r.headers.get("Content-Length")
+            written = 0
+            with open(part_path, "ab" if offset else "wb") as f:
+                for chunk in r.iter_content(chunk_size=1 << 16):
                     f.write(chunk)
+                    written += len(chunk)
+        if expected is not None and written != int(expected):
+            raise IncompleteDownload(f"Incomplete download: got {written} of {expected} bytes (partial file kept for resume)")
+        os.replace(part_path, out_path)
+        return offset + written
+
+    def _download_job(self, ticker, accession, filing_url, pdf_name):
+        save_path = os.path.join("temp", pdf_name)
+        logger.info(f"Downloading PDF for {ticker} filing {accession}...")
+        for attempt in range(1, 4):
+            try:
+                size = self.download_pdf(self.API_KEY, filing_url, save_path)
+                break
+            # HTTP errors are final here: the session's Retry already retried 429 and 5xx
+            except (IncompleteDownload, requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                if attempt == 3:
+                    raise
+                logger.warning(f"Download of {pdf_name} interrupted, resuming (attempt {attempt + 1}): {e}")
+        self._mark_complete(accession, pdf_name, size)
+        logger.info(f"Saved to {save_path}")
+        return pdf_name
+
+    def _company_filings(self, ticker, cik):
+        logger.info(f"Processing {ticker} ({cik})...")
+        filings = self.get_filings(cik, self.FORM_TYPE, self.START_YEAR, self.END_YEAR)
+        logger.info(f"Found {len(filings)} filings for {ticker}.")
+        return filings
 
     def main(self):
-        for ticker, cik in self.COMPANIES.items():
-            logger.info(f"Processing {ticker} ({cik})...")
-            filings = self.get_filings(cik, self.FORM_TYPE, self.START_YEAR, self.END_YEAR)
-            logger.info(f"Found {len(filings)} filings for {ticker}.")
+        jobs = []
+        scheduled = set()
+        with ThreadPoolExecutor(max_workers=len(self.COMPANIES)) as pool:
+            searches = {ticker: pool.submit(self._company_filings, ticker, cik) for ticker, cik in self.COMPANIES.items()}
+        for ticker, search in searches.items():
+            try:
+                filings = search.result()
+            except Exception as e:
+                logger.error(f"Failed to list filings for {ticker}: {e}")
+                continue
             for filing in filings:
                 accession = filing["accessionNo"].replace("-", "")
                 filing_url = filing["linkToFilingDetails"]
                 pdf_name = f"{ticker}_{filing['filedAt'][:4]}.pdf"
                 save_path = os.path.join("temp", pdf_name)
-                if os.path.exists(save_path):
-                    logger.info(f"Already downloaded: {pdf_name}")
+                if pdf_name in scheduled:
                     continue
+                scheduled.add(pdf_name)
+                if os.path.exists(save_path):
+                    if accession in self.manifest or self._looks_complete(save_path):
+                        if accession not in self.manifest:
+                            self._mark_complete(accession, pdf_name, os.path.getsize(save_path))
+                        logger.info(f"Already downloaded: {pdf_name}")
+                        continue
+                    logger.warning(f"Re-downloading truncated file: {pdf_name}")
+                    os.remove(save_path)
+                jobs.append((ticker, accession, filing_url, pdf_name))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._download_job, *job): job[3] for job in jobs}
+            for fut in as_completed(futures):
                 try:
-                    logger.info(f"Downloading PDF for {ticker} filing {accession}...")
-                    self.download_pdf(self.API_KEY, filing_url, save_path)
-                    logger.info(f"Saved to {save_path}")
+                    fut.result()
                 except Exception as e:
-                    logger.error(f"Failed to download {pdf_name}: {e}")
+                    logger.error(f"Failed to download {futures[fut]}: {e}")
 
 if __name__ == "__main__":
     extractor = ExtractDocuments()
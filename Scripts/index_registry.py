@@ -0,0 +1,79 @@
+import os
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from metrics import metrics
+
+
+class IndexRegistry:
+    """Process-wide LRU cache of loaded indexes, invalidated by file mtime."""
+
+    def __init__(self, max_items=32):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.RLock()
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _signature(self, paths):
+        return tuple(os.stat(p).st_mtime_ns for p in paths)
+
+    def _cached(self, key, signature):
+        entry = self._items.get(key)
+        if entry is not None and entry[0] == signature:
+            self._items.move_to_end(key)
+            self.hits += 1
+            metrics.count("index_registry.lookup", result="hit")
+            return True, entry[1]
+        return False, None
+
+    def get(self, key, paths, loader):
+        """Cached value for key, or loader()'s result. Loads run outside the registry lock, one per key at a time."""
+        paths = [Path(p) for p in paths]
+        signature = self._signature(paths)
+        with self._lock:
+            found, value = self._cached(key, signature)
+            if found:
+                return value
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            # another thread may have finished loading this key while we waited
+            with self._lock:
+                found, value = self._cached(key, signature)
+                if found:
+                    return value
+                self.misses += 1
+                metrics.count("index_registry.lookup", result="miss")
+            with metrics.span("index.load"):
+                value = loader()
+            with self._lock:
+                self._items[key] = (signature, value)
+                self._items.move_to_end(key)
+                while len(self._items) > self.max_items:
+                    self._items.popitem(last=False)
+                    self.evictions += 1
+            return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._items.clear()
+            else:
+                self._items.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "max_items": self.max_items,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+index_registry = IndexRegistry(max_items=int(os.getenv("INDEX_CACHE_SIZE", "32")))
@@ -0,0 +1,116 @@
+import json
+from loguru import logger
+from json_repair import repair_json
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class IncrementalJSONParser:
+    """Consume a JSON object as text deltas and emit one top-level string field as it arrives.
+
+    Only string/nesting state is tracked while streaming; the full document is
+    parsed once with json.loads in result() (repair_json only if that fails).
+    """
+
+    def __init__(self, field="answer"):
+        self.field = field
+        self._parts = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._unicode = None
+        self._high_surrogate = None
+        self._expect_key = False
+        self._string_is_key = False
+        self._capturing = False
+        self._key_chars = []
+        self._key = None
+        self.value = []
+
+    def feed(self, text):
+        """Add a text delta; return the newly decoded characters of the tracked field (may be '')."""
+        self._parts.append(text)
+        out = []
+        for ch in text:
+            if self._in_string:
+                if self._unicode is not None:
+                    self._unicode += ch
+                    if len(self._unicode) == 4:
+                        self._emit_codepoint(int(self._unicode, 16), out)
+                        self._unicode = None
+                elif self._escape:
+                    self._escape = False
+                    if ch == "u":
+                        self._unicode = ""
+                    else:
+                        self._emit(_ESCAPES.get(ch, ch), out)
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        self._key = "".join(self._key_chars)
+                    self._capturing = False
+                else:
+                    self._emit(ch, out)
+            elif ch == '"':
+                self._in_string = True
+                self._string_is_key = self._depth == 1 and self._expect_key
+                self._key_chars = []
+                self._capturing = self._depth == 1 and not self._expect_key and self._key == self.field
+            elif ch == "{" or ch == "[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = ch == "{"
+            elif ch == "}" or ch == "]":
+                self._depth -= 1
+            elif self._depth == 1 and ch == ":":
+                self._expect_key = False
+            elif self._depth == 1 and ch == ",":
+                self._expect_key = True
+                self._key = None
+        emitted = "".join(out)
+        if emitted:
+            self.value.append(emitted)
+        return emitted
+
+    def _emit_codepoint(self, cp, out):
+        if 0xD800 <= cp <= 0xDBFF:
+            self._high_surrogate = cp
+            return
+        if 0xDC00 <= cp <= 0xDFFF and self._high_surrogate is not None:
+            cp = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (cp - 0xDC00)
+        self._high_surrogate = None
+        self._emit(chr(cp), out)
+
+    def _emit(self, ch, out):
+        if self._string_is_key:
+            self._key_chars.append(ch)
+        elif self._capturing:
+            out.append(ch)
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    def result(self):
+        return parse_json_text(self.text)
+
+
+def parse_json_text(text):
+    """Parse the outermost JSON object/array in text; falls back to repair_json once."""
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        logger.error("Failed to format in JSON: No JSON structure found")
+        return {}
+    start = min(starts)
+    end = text.rfind("}" if text[start] == "{" else "]")
+    candidate = text[start:end + 1] if end > start else text[start:]
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        try:
+            return json.loads(repair_json(candidate))
+        except Exception as e:
+            logger.error(f"Failed to format in JSON: {str(e)}")
+            return {}
@@ -0,0 +1,119 @@
+import os
+import re
+import shutil
+import numpy as np
+from pathlib import Path
+
+_token = re.compile(r"[a-z][a-z&'-]*[a-z]|\d[\d,]*(?:\.\d+)?|[a-z]")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the their this to was were what which "
+    "with how did does do".split()
+)
+MAX_TERM_LEN = 32
+
+
+def tokenize(text):
+    """Lowercased words and numbers; thousands separators are dropped so "$211,915" matches "211915"."""
+    tokens = []
+    for tok in _token.findall(text.lower()):
+        if tok[0].isdigit():
+            tok = tok.replace(",", "")
+        elif tok in STOPWORDS or len(tok) < 2:
+            continue
+        tokens.append(tok[:MAX_TERM_LEN])
+    return tokens
+
+
+class LexicalIndex:
+    """BM25 inverted index over one filing's chunks, stored as flat arrays.
+
+    Layout of the `<pdf>.bm25/` directory:
+        vocab.npy         sorted terms (fixed-width unicode), looked up with searchsorted
+        term_offsets.npy  int64 start of each term's postings (V + 1 entries)
+        doc_ids.npy       int32 chunk id of each posting
+        tfs.npy           uint16 term frequency of each posting
+        doc_len.npy       int32 token count of each chunk
+
+    Chunk ids are the ids of the filing's ChunkStore and FAISS index.
+    """
+
+    def __init__(self, path, k1=None, b=None):
+        self.path = Path(path)
+        self.vocab = np.load(self.path / "vocab.npy", mmap_mode="r")
+        self.term_offsets = np.load(self.path / "term_offsets.npy", mmap_mode="r")
+        self.doc_ids = np.load(self.path / "doc_ids.npy", mmap_mode="r")
+        self.tfs = np.load(self.path / "tfs.npy", mmap_mode="r")
+        self.doc_len = np.load(self.path / "doc_len.npy")
+        self.k1 = k1 if k1 is not None else float(os.getenv("BM25_K1", "1.2"))
+        self.b = b if b is not None else float(os.getenv("BM25_B", "0.75"))
+        self.avgdl = float(self.doc_len.mean()) if len(self.doc_len) else 0.0
+
+    @staticmethod
+    def path_for(meta_path):
+        meta_path = Path(meta_path)
+        return meta_path.with_name(meta_path.name[:-len(".meta.json")] + ".bm25")
+
+    @classmethod
+    def write(cls, path, texts):
+        path = Path(path)
+        docs = [tokenize(t) for t in texts]
+        vocab = sorted({tok for toks in docs for tok in toks})
+        term_ids = {tok: i for i, tok in enumerate(vocab)}
+        rows, cols = [], []
+        for doc_id, toks in enumerate(docs):
+            rows.extend(term_ids[tok] for tok in toks)
+            cols.extend([doc_id] * len(toks))
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        # one posting per (term, chunk) with its count, grouped by term and ordered by chunk
+        keys, tfs = np.unique(rows * max(len(docs), 1) + cols, return_counts=True)
+        term_of = keys // max(len(docs), 1)
+        term_offsets = np.searchsorted(term_of, np.arange(len(vocab) + 1), side="left").astype(np.int64)
+
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        np.save(tmp / "vocab.npy", np.asarray(vocab, dtype=f"<U{MAX_TERM_LEN}"))
+        np.save(tmp / "term_offsets.npy", term_offsets)
+        np.save(tmp / "doc_ids.npy", (keys % max(len(docs), 1)).astype(np.int32))
+        np.save(tmp / "tfs.npy", np.minimum(tfs, np.iinfo(np.uint16).max).astype(np.uint16))
+        np.save(tmp / "doc_len.npy", np.asarray([len(toks) for toks in docs], dtype=np.int32))
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+        return cls(path)
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def _term_id(self, term):
+        i = int(np.searchsorted(self.vocab, term))
+        return i if i < len(self.vocab) and self.vocab[i] == term else None
+
+    def scores(self, query):
+        """BM25 score of every chunk for `query`."""
+        n = len(self.doc_len)
+        scores = np.zeros(n, dtype=np.float32)
+        if not n:
+            return scores
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len / (self.avgdl or 1.0))
+        for term in set(tokenize(query)):
+            term_id = self._term_id(term)
+            if term_id is None:
+                continue
+            start, end = int(self.term_offsets[term_id]), int(self.term_offsets[term_id + 1])
+            docs = np.asarray(self.doc_ids[start:end])
+            tf = np.asarray(self.tfs[start:end], dtype=np.float32)
+            idf = np.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm[docs])
+        return scores
+
+    def search(self, queries, top_k=5):
+        """Top chunk ids and BM25 scores per query; chunks with no matching term are left out."""
+        results = []
+        for query in queries:
+            scores = self.scores(query)
+            k = min(top_k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k] if k else np.empty(0, dtype=np.int64)
+            top = top[np.argsort(-scores[top], kind="stable")]
+            results.append([(int(i), float(scores[i])) for i in top if scores[i] > 0])
+        return results
@@ -1,21 +1,48 @@
 import os
 import json
+import time
 import boto3
+import asyncio
 import backoff
 from loguru import logger
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from llm_cache import LLMCache
+from json_stream import IncrementalJSONParser
 from json_repair import repair_json
+from metrics import metrics
 
 load_dotenv()
 
 class LLM:
-    def __init__(self):
+    def __init__(self, max_concurrency=None):
+        self.model_id = os.getenv("BEDROCK_MODEL_ID", "us.anthropic.claude-sonnet-4-20250514-v1:0")
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        # adaptive retries back off on ThrottlingException with a client-side rate limiter shared by all threads
+        config = Config(
+            max_pool_connections=max(10, self.max_concurrency),
+            retries={"mode": "adaptive", "max_attempts": int(os.getenv("LLM_MAX_ATTEMPTS", "8"))},
+            connect_timeout=10,
+            read_timeout=int(os.getenv("LLM_READ_TIMEOUT", "300")),
+            tcp_keepalive=True
+        )
         self.bedrock_client = boto3.client(
             'bedrock-runtime',
             region_name=os.getenv("REGION"),
             aws_access_key_id=os.getenv("ACCESSKEY"),
-            aws_secret_access_key=os.getenv("SECRETKEY")
+            aws_secret_access_key=os.getenv("SECRETKEY"),
+            endpoint_url=os.getenv("BEDROCK_ENDPOINT_URL") or None,
+            config=config
         )
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="bedrock")
+        self.cache = None
+        if os.getenv("LLM_CACHE", "1") != "0":
+            self.cache = LLMCache(
+                os.getenv("LLM_CACHE_PATH", "cache/llm_responses.sqlite3"),
+                max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024),
+                ttl_seconds=int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+            )
     
     def _json(self, response):
         output = {}
@@ -47,10 +74,50 @@ class LLM:
         factor=2,
         on_backoff=lambda details: logger.warning(f"Retrying LLM call (attempt {details['tries']})")
     )        
-    def _call_llm(self, system, context):
+    def _invoke(self, system, context, stage=None):
         """Make API call to Bedrock Claude Sonnet with retry mechanism"""
+        body = self._request_body(system, context)
+
+        result = ""
+        try:
+            # Make the API call to Bedrock
+            with metrics.span("llm.call", stage=stage, mode="invoke"):
+                response = self.bedrock_client.invoke_model(
+                    modelId=self.model_id,
+                    body=json.dumps(body),
+                    contentType="application/json",
+                    accept="application/json"
+                )
+                response_body = json.loads(response['body'].read())
+            self._record_usage(response_body.get("usage"), stage)
+            result = ' '.join([content['text'] for content in response_body['content']])
+            result = self._json(result)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse JSON response: {str(e)}")
+            raise
+        return result
+
+    @staticmethod
+    def _record_usage(usage, stage):
+        if usage:
+            metrics.count("llm.input_tokens", usage.get("input_tokens", 0), stage=stage)
+            metrics.count("llm.output_tokens", usage.get("output_tokens", 0), stage=stage)
+
+    def _cache_get(self, key, stage):
+        cached = self.cache.get(key, stage=stage)
+        metrics.count("llm.cache", result="miss" if cached is None else "hit", stage=stage)
+        return cached
+
+    def _cache_put(self, key, result):
+        # the response is already in hand; a failed cache write must not fail the call
+        try:
+            self.cache.put(key, self.model_id, result)
+        except Exception as e:
+            logger.warning(f"Failed to cache LLM response | ERROR: {str(e)}")
+
+    def _request_body(self, system, context):
         ### Prepare the request body for Claude Sonnet
-        body = {
+        return {
             "anthropic_version": "bedrock-2023-05-31",
             "max_tokens": 8192,
             "system": system,
@@ -63,19 +130,65 @@ class LLM:
             "temperature": 0
         }
 
-        result = ""
-        try:
-            # Make the API call to Bedrock
-            response = self.bedrock_client.invoke_model(
-                modelId="us.anthropic.claude-sonnet-4-20250514-v1:0",
-                body=json.dumps(body),
+    def _stream_llm(self, system, context, on_delta, field="answer", stage=None):
+        """Stream a completion, calling on_delta(text) as the JSON `field` string arrives; returns the parsed JSON."""
+        key = None
+        if self.cache is not None:
+            key = LLMCache.key(self.model_id, system, context)
+            cached = self._cache_get(key, stage)
+            if cached is not None:
+                if cached.get(field):
+                    on_delta(cached[field])
+                return cached
+
+        start = time.perf_counter()
+        first_delta = None
+        usage = {}
+        parser = IncrementalJSONParser(field)
+        with metrics.span("llm.call", stage=stage, mode="stream"):
+            response = self.bedrock_client.invoke_model_with_response_stream(
+                modelId=self.model_id,
+                body=json.dumps(self._request_body(system, context)),
                 contentType="application/json",
                 accept="application/json"
             )
-            response_body = json.loads(response['body'].read())
-            result = ' '.join([content['text'] for content in response_body['content']])
-            result = self._json(result)
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {str(e)}")
-            raise
-        return result
\ No newline at end of file
+            for event in response["body"]:
+                chunk = event.get("chunk")
+                if not chunk:
+                    continue
+                payload = json.loads(chunk["bytes"])
+                if payload.get("type") == "content_block_delta" and payload["delta"].get("type") == "text_delta":
+                    delta = parser.feed(payload["delta"]["text"])
+                    if delta:
+                        if first_delta is None:
+                            first_delta = (time.perf_counter() - start) * 1000
+                        on_delta(delta)
+                elif payload.get("type") == "message_start":
+                    usage.update(payload.get("message", {}).get("usage", {}))
+                elif payload.get("type") == "message_delta":
+                    usage.update(payload.get("usage", {}))
+        if first_delta is not None:
+            metrics.observe("llm.first_delta_ms", first_delta, stage=stage)
+        self._record_usage(usage, stage)
+        result = parser.result()
+        if self.cache is not None and result:
+            self._cache_put(key, result)
+        return result
+
+    def _call_llm(self, system, context, stage=None):
+        """Cached _invoke: identical (model, system prompt, context) requests are answered from the response cache."""
+        if self.cache is None:
+            return self._invoke(system, context, stage=stage)
+        key = LLMCache.key(self.model_id, system, context)
+        cached = self._cache_get(key, stage)
+        if cached is not None:
+            return cached
+        result = self._invoke(system, context, stage=stage)
+        if result:
+            self._cache_put(key, result)
+        return result
+
+    async def _acall_llm(self, system, context, stage=None):
+        """Awaitable _call_llm; at most max_concurrency requests are in flight per LLM instance."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call_llm, system, context, stage)
@@ -1,19 +1,33 @@
 import os
 import json
-import faiss
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import numpy as np
 from utils import *
-from llm import LLM
 from prompt import *
 from pathlib import Path
 from loguru import logger
-from get_docs import ExtractDocuments
-from sentence_transformers import SentenceTransformer
+from corpus_index import CorpusIndex
+from index_registry import index_registry
+from embedding_cache import EmbeddingCache
+from chunk_store import ChunkStore, load_meta_and_store, write_meta
+from context_builder import ContextBuilder
+from query_planner import QueryPlanner
+from embedder import Embedder
+from vector_index import VectorIndex, index_config
+from lexical_index import LexicalIndex
+from fact_store import FactStore, metric_for_query, describe_metric, format_value
+from metrics import metrics, histograms
 
 class PageIndexer:
     def __init__(self):
         self.model_name = os.getenv("EMBED_MODEL_NAME")
-        self.model = SentenceTransformer(self.model_name)
+        self.embedding_id = Embedder.embedding_id(self.model_name)
+        self._model = None
+        self._llm = None
+        self._embedding_cache = None
+        self._init_lock = threading.Lock()
         self.filename_mapping = {
             "google": "GOOGL",
             "microsoft": "MSFT",
@@ -21,9 +35,91 @@ class PageIndexer:
         }
         data_dir = Path("temp")
         data_dir.mkdir(exist_ok=True)
-        self.llm = LLM()
         self.INDEX_DIR = Path("indexes")
         self.INDEX_DIR.mkdir(parents=True, exist_ok=True)
+        self.index_backend = os.getenv("INDEX_BACKEND", "per_filing").lower()
+        self.corpus = CorpusIndex(self.INDEX_DIR) if self.index_backend == "corpus" else None
+        self.chunking = self._chunking_config()
+        self.index_config = index_config()
+        self.pdf_backend = get_extractor().name
+        self.extract_workers = int(os.getenv("PDF_EXTRACT_WORKERS", "1"))
+        self._current = {}
+        self.context_builder = ContextBuilder()
+        self.retrieval_workers = int(os.getenv("RETRIEVAL_WORKERS", "8"))
+        self.retrieval_top_k = 2
+        self.retrieval_mode = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+        self.hybrid_depth = int(os.getenv("HYBRID_CANDIDATES", "4"))
+        self.rrf_k = int(os.getenv("HYBRID_RRF_K", "60"))
+        self.planner = QueryPlanner(self.filename_mapping) if os.getenv("QUERY_PLANNER", "1") != "0" else None
+        self.fact_store = FactStore(self.INDEX_DIR / "facts.sqlite3") if os.getenv("FACT_STORE", "1") != "0" else None
+
+    # The embedder, Bedrock client and embedding cache are created on first use,
+    # so constructing a PageIndexer does not import torch, faiss or boto3.
+    @property
+    def model(self):
+        if self._model is None:
+            with self._init_lock:
+                if self._model is None:
+                    self._model = Embedder(self.model_name)
+        return self._model
+
+    @model.setter
+    def model(self, value):
+        self._model = value
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._init_lock:
+                if self._llm is None:
+                    from llm import LLM
+                    self._llm = LLM()
+        return self._llm
+
+    @llm.setter
+    def llm(self, value):
+        self._llm = value
+
+    @property
+    def embedding_cache(self):
+        if self._embedding_cache is None and os.getenv("EMBED_CACHE", "1") != "0":
+            with self._init_lock:
+                if self._embedding_cache is None:
+                    self._embedding_cache = EmbeddingCache(
+                        self.INDEX_DIR / "embedding_cache",
+                        self.embedding_id,
+                        max_bytes=int(float(os.getenv("EMBED_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+                    )
+        return self._embedding_cache
+
+    def warm_up(self, preload_indexes=True):
+        """Load the model, LLM client and (optionally) every built index now rather than on the first query."""
+        self.model.encode(["warm up"], normalize_embeddings=True)
+        _ = self.llm  # creates the Bedrock client
+        if preload_indexes:
+            for meta_path in sorted(self.INDEX_DIR.glob("*.meta.json")):
+                pdf_name = meta_path.name[:-len(".meta.json")]
+                if pdf_name == "corpus":
+                    continue
+                try:
+                    self._load_index_and_meta(pdf_name)
+                except Exception as e:
+                    logger.error(f"Failed to preload index for {pdf_name} | ERROR: {str(e)}")
+            self.refresh_corpus_index()
+            self.refresh_fact_store()
+
+    def _chunking_config(self):
+        strategy = os.getenv("CHUNK_STRATEGY", "tokens").lower()
+        if strategy == "chars":
+            return {"max_len": 512, "overlap": int(os.getenv("CHUNK_OVERLAP", "50"))}
+        if strategy != "tokens":
+            raise ValueError(f"Unknown chunking strategy '{strategy}'. Use 'tokens' or 'chars'.")
+        return {
+            "strategy": "tokens",
+            "max_tokens": int(os.getenv("CHUNK_MAX_TOKENS", "256")),
+            "overlap_tokens": int(os.getenv("CHUNK_OVERLAP_TOKENS", "32")),
+            "tokenizer": self.model_name,
+        }
 
     def _file_keys(self, pdf_name):
         stem = Path(pdf_name).name
@@ -33,164 +129,538 @@ class PageIndexer:
         return idx_path, meta_path
 
     def _chunk_text(self, text, max_len=512, overlap=50):
-        chunks = []
-        start = 0
-        while start < len(text):
-            end = min(start + max_len, len(text))
-            chunks.append(text[start:end])
-            if end == len(text):
-                break
-            start += max_len - overlap
-        return chunks
+        return chunk_text(text, max_len=max_len, overlap=overlap)
+
+    @staticmethod
+    def _page_scores(page_score_pairs):
+        page_scores = {}
+        for page, score in page_score_pairs:
+            page_scores[page] = max(score, page_scores.get(page, -np.inf))
+        return page_scores
+
+    def _search_index(self, pdf_name, q_embs, top_k):
+        index, meta, store = self._load_index_and_meta(pdf_name)
+        scores, ids = index.search(q_embs, min(top_k, meta["num_vectors"]))
+        return [
+            self._page_scores((store.page(i), score) for score, i in zip(row_scores.tolist(), row_ids.tolist()) if i >= 0)
+            for row_scores, row_ids in zip(scores, ids)
+        ]
+
+    def _dense_search_many(self, requests, top_k=5):
+        """Retrieve page scores for (pdf_name, query) pairs: one encode call, one search per index, indexes in parallel."""
+        with metrics.span("retrieval.encode"):
+            q_embs = self.model.encode([q for _, q in requests], normalize_embeddings=True).astype(np.float32)
+        with metrics.span("retrieval.dense"):
+            return self._dense_search(requests, q_embs, top_k)
+
+    def _dense_search(self, requests, q_embs, top_k):
+        if self.corpus is not None:
+            wheres = [[CorpusIndex.parse_pdf_name(pdf_name)] for pdf_name, _ in requests]
+            return [
+                self._page_scores((hit["page"], hit["score"]) for hit in hits)
+                for hits in self.corpus.search_batch(q_embs, wheres, top_k=top_k)
+            ]
+
+        groups = {}
+        for row, (pdf_name, _) in enumerate(requests):
+            groups.setdefault(pdf_name, []).append(row)
+        results = [{} for _ in requests]
+        with ThreadPoolExecutor(max_workers=max(1, min(len(groups), self.retrieval_workers))) as pool:
+            futures = {
+                pool.submit(self._search_index, pdf_name, q_embs[rows], top_k): (pdf_name, rows)
+                for pdf_name, rows in groups.items()
+            }
+            for fut in as_completed(futures):
+                pdf_name, rows = futures[fut]
+                try:
+                    for row, page_scores in zip(rows, fut.result()):
+                        results[row] = page_scores
+                except Exception as e:
+                    logger.error(f"Retrieval failed for {pdf_name} | ERROR: {str(e)}")
+        return results
+
+    def _load_lexical_index(self, pdf_name):
+        _, meta_path = self._file_keys(pdf_name)
+        path = LexicalIndex.path_for(meta_path)
+
+        def load():
+            if not path.exists():
+                # indexes built before BM25 existed: build it from the stored chunks, no re-embedding
+                _, _, store = self._load_index_and_meta(pdf_name)
+                return LexicalIndex.write(path, (store.text(i) for i in range(len(store))))
+            return LexicalIndex(path)
+
+        return index_registry.get(str(path), [meta_path], load)
+
+    def _lexical_search_many(self, requests, top_k=5):
+        results = [{} for _ in requests]
+        for row, (pdf_name, query) in enumerate(requests):
+            try:
+                lexical = self._load_lexical_index(pdf_name)
+                _, _, store = self._load_index_and_meta(pdf_name)
+            except Exception as e:
+                logger.error(f"Lexical retrieval failed for {pdf_name} | ERROR: {str(e)}")
+                continue
+            results[row] = self._page_scores((store.page(i), score) for i, score in lexical.search([query], top_k)[0])
+        return results
+
+    def _fuse(self, dense, lexical, top_k):
+        """Reciprocal rank fusion of two page rankings; returns the top_k pages with their fused scores."""
+        fused = {}
+        for ranking in (dense, lexical):
+            for rank, page in enumerate(sorted(ranking, key=ranking.get, reverse=True)):
+                fused[page] = fused.get(page, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        top = sorted(fused, key=fused.get, reverse=True)[:top_k]
+        return {page: fused[page] for page in top}
+
+    def search_many(self, requests, top_k=5):
+        """Page scores for each (pdf_name, query) pair, from dense search or its fusion with BM25 (RETRIEVAL_MODE)."""
+        if not requests:
+            return []
+        if self.retrieval_mode != "hybrid":
+            return self._dense_search_many(requests, top_k)
+        depth = top_k * self.hybrid_depth
+        dense = self._dense_search_many(requests, depth)
+        with metrics.span("retrieval.lexical"):
+            lexical = self._lexical_search_many(requests, depth)
+        return [self._fuse(d, l, top_k) for d, l in zip(dense, lexical)]
+
+    def get_top_page_scores(self, pdf_name, query, top_k=5):
+        return self.search_many([(pdf_name, query)], top_k=top_k)[0]
 
     def get_top_pages(self, pdf_name, query, top_k=5):
-        index, meta = self._load_index_and_meta(pdf_name)
-        q_emb = self.model.encode([query], normalize_embeddings=True).astype(np.float32)
-        scores, ids = index.search(q_emb, min(top_k, meta["num_vectors"]))
-        ids = ids[0].tolist()
-        pages = set()
-        for i in ids:
-            if i >= 0:
-                pages.add(meta["chunks"][i]["page"])
-        return list(pages)
+        return list(self.get_top_page_scores(pdf_name, query, top_k=top_k))
 
-    def build_index_for_pdf(self, pdf_path, min_chars_per_page=40, overwrite=False):
+    def _encode_chunks(self, texts, batch_size=32):
+        def encode(batch):
+            return self.model.encode(batch, batch_size=batch_size, normalize_embeddings=True)
+        if self.embedding_cache is None:
+            return np.asarray(encode(texts), dtype=np.float32)
+        return self.embedding_cache.encode(texts, encode)
+
+    def _index_fingerprint(self, pdf_path, min_chars_per_page=40):
+        return {
+            "model_name": self.embedding_id,
+            "chunking": {**self.chunking, "min_chars_per_page": min_chars_per_page},
+            "extractor": self.pdf_backend,
+            "index_config": self.index_config,
+            "source_sha256": file_sha256(pdf_path),
+        }
+
+    def _index_is_current(self, pdf_path, min_chars_per_page=40):
         pdf_path = Path(pdf_path)
         idx_path, meta_path = self._file_keys(pdf_path.name)
+        if not idx_path.exists() or not meta_path.exists():
+            return False
+        signature = (pdf_path.stat().st_mtime_ns, meta_path.stat().st_mtime_ns, min_chars_per_page)
+        cached = self._current.get(pdf_path.name)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        fingerprint = self._index_fingerprint(pdf_path, min_chars_per_page)
+        current = all(meta.get(k) == v for k, v in fingerprint.items())
+        if not current:
+            logger.info(f"Index for {pdf_path.name} is stale (model, chunking, extractor, index type or source changed)")
+        self._current[pdf_path.name] = (signature, current)
+        return current
 
-        if not overwrite and idx_path.exists() and meta_path.exists():
-            return {"status": "skipped", "reason": "index already exists", "pdf": pdf_path.name}
+    def build_index_for_pdf(self, pdf_path, min_chars_per_page=40, overwrite=False):
+        pdf_path = Path(pdf_path)
 
-        pages = load_pdf_pages(pdf_path)
-        records = []
-        for i, t in enumerate(pages, start=1):
-            if len(t) >= min_chars_per_page:
-                chunks = self._chunk_text(t, max_len=512, overlap=50)
-                for chunk in chunks:
-                    records.append({"page": i, "text": chunk})
+        if not overwrite and self._index_is_current(pdf_path, min_chars_per_page):
+            return {"status": "skipped", "reason": "index up to date", "pdf": pdf_path.name}
 
+        records = extract_page_chunks(
+            pdf_path,
+            min_chars_per_page=min_chars_per_page,
+            backend=self.pdf_backend,
+            workers=self.extract_workers,
+            **self.chunking
+        )
         if not records:
             raise ValueError(f"No valid chunks found in {pdf_path.name}.")
 
         texts = [r["text"] for r in records]
-        embs = self.model.encode(texts, normalize_embeddings=True)
+        embs = self._encode_chunks(texts)
+        return self._write_index(pdf_path.name, records, embs, self._index_fingerprint(pdf_path, min_chars_per_page))
+
+    def _write_index(self, pdf_name, records, embs, fingerprint):
+        idx_path, meta_path = self._file_keys(pdf_name)
         embs = np.asarray(embs, dtype=np.float32)
         dim = embs.shape[1]
 
-        index = faiss.IndexFlatIP(dim)
-        index.add(embs)
-        faiss.write_index(index, str(idx_path))
+        _, index_params = VectorIndex.write(idx_path, embs, self.index_config)
 
+        store = ChunkStore.write(ChunkStore.path_for(meta_path), records)
+        lexical = LexicalIndex.write(LexicalIndex.path_for(meta_path), (r["text"] for r in records))
         meta = {
-            "pdf_name": pdf_path.name,
-            "model_name": self.model_name,
+            "pdf_name": pdf_name,
+            **fingerprint,
             "dim": dim,
             "num_vectors": len(records),
-            "chunks": records,
+            "chunk_stats": chunk_stats(records),
+            "index_type": index_params["type"],
+            "index_params": index_params,
+            "num_pages": len(set(store.pages.tolist())),
+            "chunk_store": store.path.name,
+            "lexical_index": lexical.path.name,
         }
-        with open(meta_path, "w", encoding="utf-8") as f:
-            json.dump(meta, f, ensure_ascii=False)
+        write_meta(meta_path, meta)
         return {
             "status": "ok",
-            "pdf": pdf_path.name,
+            "pdf": pdf_name,
             "vectors": len(records),
+            "index_type": index_params["type"],
             "index": str(idx_path),
             "meta": str(meta_path)
         }
 
+    def _read_index_and_meta(self, idx_path, meta_path):
+        meta, store = load_meta_and_store(meta_path)
+        index = VectorIndex.read(idx_path, meta.get("index_params"))
+        return index, meta, store
+
     def _load_index_and_meta(self, pdf_name: str):
         idx_path, meta_path = self._file_keys(pdf_name)
         if not idx_path.exists() or not meta_path.exists():
             raise FileNotFoundError(f"Index/meta not found for '{pdf_name}'. Build it first.")
-        index = faiss.read_index(str(idx_path))
-        with open(meta_path, "r", encoding="utf-8") as f:
-            meta = json.load(f)
-        return index, meta
+        return index_registry.get(
+            str(idx_path),
+            [idx_path, meta_path],
+            lambda: self._read_index_and_meta(idx_path, meta_path)
+        )
 
-    def build_indexes_in_folder(self, folder, overwrite=False):
+    def build_indexes_in_folder(self, folder, overwrite=False, workers=None, batch_size=None):
+        """Build missing or stale indexes; returns one result dict per built filing. Failures are logged and skipped."""
         folder = Path(folder)
         pdfs = sorted([p for p in folder.glob("*.pdf")])
+        if not overwrite:
+            pdfs = [p for p in pdfs if not self._index_is_current(p)]
+        workers = workers or int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))
+        if workers > 1 and len(pdfs) > 1:
+            return self._build_indexes_pipelined(pdfs, workers, batch_size)
+        results = []
         for p in pdfs:
             try:
-                out = self.build_index_for_pdf(p, overwrite=overwrite)
+                results.append(self.build_index_for_pdf(p, overwrite=overwrite))
             except Exception as e:
                 logger.error(f"Failed to build index for {p.name} | ERROR: {str(e)}")
+        return results
 
-    def get_relevant_pagetext(self, pdf_filename, pages):
-        meta_path = f"./indexes/{pdf_filename}.meta.json"
+    def _build_indexes_pipelined(self, pdfs, workers, batch_size=None, min_chars_per_page=40):
+        """Extract/chunk in a process pool, embed cross-document batches here, write indexes on a writer thread."""
+        batch_size = batch_size or int(os.getenv("EMBED_BATCH_SIZE", "256"))
+        docs = {}
+        buffer = []
+        writes = []
+
+        def write(name):
+            doc = docs.pop(name)
+            fingerprint = self._index_fingerprint(doc["path"], min_chars_per_page)
+            return self._write_index(name, doc["records"], np.concatenate(doc["parts"]), fingerprint)
+
+        def flush(writer):
+            texts = [t for _, seg in buffer for t in seg]
+            try:
+                embs = self._encode_chunks(texts, batch_size=batch_size)
+            except Exception as e:
+                # drop only the filings in this batch; their later segments are skipped as well
+                for name in dict.fromkeys(name for name, _ in buffer):
+                    docs.pop(name, None)
+                    logger.error(f"Failed to embed chunks for {name} | ERROR: {str(e)}")
+                buffer.clear()
+                return
+            offset = 0
+            for name, seg in buffer:
+                doc = docs.get(name)
+                if doc is None:
+                    offset += len(seg)
+                    continue
+                doc["parts"].append(embs[offset:offset + len(seg)])
+                doc["done"] += len(seg)
+                offset += len(seg)
+                if doc["done"] == len(doc["records"]):
+                    writes.append((name, writer.submit(write, name)))
+            buffer.clear()
+
+        with ProcessPoolExecutor(max_workers=workers) as extractor:
+            futures = {
+                extractor.submit(extract_page_chunks, p, min_chars_per_page, backend=self.pdf_backend, **self.chunking): p
+                for p in pdfs
+            }
+            with ThreadPoolExecutor(max_workers=1) as writer:
+                buffered = 0
+                for fut in as_completed(futures):
+                    path = futures[fut]
+                    name = path.name
+                    try:
+                        records = fut.result()
+                        if not records:
+                            raise ValueError(f"No valid chunks found in {name}.")
+                    except Exception as e:
+                        logger.error(f"Failed to build index for {name} | ERROR: {str(e)}")
+                        continue
+                    docs[name] = {"path": path, "records": records, "parts": [], "done": 0}
+                    texts = [r["text"] for r in records]
+                    start = 0
+                    while start < len(texts):
+                        seg = texts[start:start + batch_size - buffered]
+                        buffer.append((name, seg))
+                        buffered += len(seg)
+                        start += len(seg)
+                        if buffered >= batch_size:
+                            flush(writer)
+                            buffered = 0
+                            if name not in docs:
+                                break
+                if buffer:
+                    flush(writer)
+
+        results = []
+        for name, fut in writes:
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                logger.error(f"Failed to write index for {name} | ERROR: {str(e)}")
+        return results
+
+    def refresh_corpus_index(self):
+        if self.corpus is None:
+            return None
+        if self.corpus.is_stale():
+            return self.corpus.build()
+        if self.corpus.index is None:
+            self.corpus.load()
+        return {"status": "skipped", "reason": "corpus index up to date"}
+
+    def refresh_fact_store(self):
+        """Parse the metric tables of every filing whose index changed since it was last ingested."""
+        if self.fact_store is None:
+            return 0
+        ingested = 0
+        for meta_path in sorted(self.INDEX_DIR.glob("*.meta.json")):
+            pdf_name = meta_path.name[:-len(".meta.json")]
+            if pdf_name == "corpus" or self.fact_store.version(pdf_name) == meta_path.stat().st_mtime_ns:
+                continue
+            try:
+                _, meta, store = self._load_index_and_meta(pdf_name)
+            except Exception as e:
+                logger.error(f"Failed to load index for fact extraction {pdf_name} | ERROR: {str(e)}")
+                continue
+            overlap = meta.get("chunking", {}).get("overlap", 50)
+            pages = {page: store.page_text(page, overlap=overlap) for page in np.unique(store.pages).tolist()}
+            facts = self.fact_store.ingest(pdf_name, pdf_name.split("_")[0], pages, meta_path.stat().st_mtime_ns)
+            logger.info(f"Fact store: {facts} facts from {pdf_name}")
+            ingested += 1
+        return ingested
+
+    def get_page_passages(self, pdf_filename, page_scores):
         try:
-            with open(meta_path, "r") as f:
-                data = json.load(f)
+            _, meta, store = self._load_index_and_meta(pdf_filename)
         except FileNotFoundError:
-            logger.error(f"Metadata file not found: {meta_path}")
-            return ""
-
-        page_texts = {}
-        for chunk in data.get("chunks", []):
-            page = chunk['page']
-            if page in pages:
-                if page not in page_texts:
-                    page_texts[page] = chunk['text']
-                else:
-                    page_texts[page] += " " + chunk['text']
-        context = ""
-        for page in pages:
-            text = page_texts.get(page)
+            logger.error(f"Metadata file not found: {self._file_keys(pdf_filename)[1]}")
+            return []
+
+        overlap = meta.get("chunking", {}).get("overlap", 50)
+        passages = []
+        for page, score in page_scores.items():
+            text = store.page_text(page, overlap=overlap)
             if text:
-                context += f"<PAGENUMBER>{page}</PAGENUMBER>\n<PAGETEXT>{text}</PAGETEXT>\n\n\n"
-        return context
+                start, end = store.page_chunk_range(page)
+                passages.append({
+                    "pdf_name": pdf_filename,
+                    "page": page,
+                    "score": score,
+                    "text": text,
+                    "raw_chars": len(text) + store.page_repeated_chars(page, overlap) + end - start - 1,
+                })
+        return passages
 
-    def main(self, userquery):
-        llm_final_response = {
-            "query": userquery,
-            "answer": "",
-            "reasoning": "",
-            "sub_queries": [],
-            "sources": ""
-        }
-        self.build_indexes_in_folder("temp", overwrite=False)
-        sub_query_output = self.llm._call_llm(query_decomposition, userquery)
+    def get_relevant_pagetext(self, pdf_filename, pages):
+        passages = self.get_page_passages(pdf_filename, {page: 0.0 for page in pages})
+        return "".join(ContextBuilder.format_page(p["page"], p["text"]) for p in passages)
+
+    def _pdf_for(self, company_year):
+        company_key, year = company_year.split("_")
+        filename = self.filename_mapping[company_key]
+        return f"{filename}_{year}.pdf"
+
+    def _retrieval_requests(self, userquery, sub_query_output):
+        """(pdf_name, query) pairs to retrieve for a decomposition; None when it is unusable."""
         decomposition = sub_query_output.get("decomposition", False)
         companies_year = sub_query_output.get("companies_year", [])
         sub_queries = sub_query_output.get("queries", [])
 
-        final_input_context = ""
+        requests = []
 
         if decomposition and sub_queries:
             for idx, query in enumerate(sub_queries):
                 try:
-                    company_key, year = companies_year[idx].split("_")
-                    filename = self.filename_mapping[company_key]
-                    pdf_path = f"{filename}_{year}.pdf"
-                    pages = self.get_top_pages(pdf_path, query, top_k=2)
-                    context = self.get_relevant_pagetext(pdf_path, pages)
-                    final_input_context += context
+                    requests.append((self._pdf_for(companies_year[idx]), query))
                 except (KeyError, IndexError) as e:
                     logger.error(f"Invalid decomposition data: {e}")
                     continue
         else:
             try:
-                company_key, year = companies_year[0].split("_")
-                filename = self.filename_mapping[company_key]
-                pdf_path = f"{filename}_{year}.pdf"
-                pages = self.get_top_pages(pdf_path, userquery, top_k=2)
-                final_input_context = self.get_relevant_pagetext(pdf_path, pages)
+                requests = [(self._pdf_for(companies_year[0]), userquery)]
             except (KeyError, IndexError) as e:
                 logger.error(f"Invalid user query: {userquery} | Error: {e}")
-                return {}
-            
-        chat_prompt = chat_system_prompt.replace("<<query>>", userquery)
-        chat_response = self.llm._call_llm(chat_prompt, final_input_context)
+                return None
+        return requests
+
+    def _assemble_context(self, requests, results):
+        with metrics.span("query.context"):
+            passages = []
+            for (pdf_path, _), page_scores in zip(requests, results):
+                passages.extend(self.get_page_passages(pdf_path, page_scores))
+            final_input_context, context_stats = self.context_builder.build(passages)
+        metrics.observe("context.tokens", context_stats["tokens"])
+        metrics.count("context.tokens_saved", context_stats["tokens_saved"])
+        return final_input_context
+
+    def _build_context(self, userquery, sub_query_output):
+        """Retrieve and assemble the answer context; returns None when the decomposition is unusable."""
+        requests = self._retrieval_requests(userquery, sub_query_output)
+        if requests is None:
+            return None
+        with metrics.span("query.retrieval"):
+            results = self.search_many(requests, top_k=self.retrieval_top_k)
+        return self._assemble_context(requests, results)
 
+    def _final_response(self, userquery, sub_query_output, chat_response):
+        llm_final_response = {
+            "query": userquery,
+            "answer": "",
+            "reasoning": "",
+            "sub_queries": [],
+            "sources": ""
+        }
         llm_final_response.update({
             "answer": chat_response.get("answer", ""),
             "reasoning": chat_response.get("reasoning", ""),
-            "sub_queries": sub_queries,
+            "sub_queries": sub_query_output.get("queries", []),
             "sources": chat_response.get("source", "")
         })
         return llm_final_response
 
+    def _direct_answer(self, userquery):
+        """Answer a plain metric lookup ("Microsoft's total revenue in 2023") from the fact store.
+
+        Returns a response shaped like _final_response, or None when the question
+        needs retrieval: unknown company/year, no single recognised metric,
+        comparative or explanatory wording, or any fact missing from the store.
+
+        The year in the question is matched against the fiscal year of the
+        statement column, not the filing year used to route retrieval
+        (_pdf_for). They agree for Microsoft and NVIDIA, whose 10-Ks are filed in
+        the year their fiscal year ends; Alphabet's fiscal 2023 is reported in the
+        10-K filed in 2024. When the fact comes from a different filing than
+        retrieval would read, the reasoning says so.
+        """
+        if self.fact_store is None or self.planner is None:
+            return None
+        plan, confidence = self.planner.analyze(userquery)
+        if confidence < self.planner.min_confidence or not plan["companies_year"]:
+            return None
+        answers, reasoning, sources = [], [], []
+        for company_year in plan["companies_year"]:
+            company_key, year = company_year.split("_")
+            ticker = self.filename_mapping.get(company_key)
+            metric = metric_for_query(userquery, ticker)
+            if metric is None:
+                return None
+            fact = self.fact_store.lookup(ticker, year, metric)
+            metrics.count("query.fact_store", result="miss" if fact is None else "hit")
+            if fact is None:
+                return None
+            company = self.planner.DISPLAY_NAMES.get(company_key, company_key.title())
+            answers.append(f"{company}'s {describe_metric(metric)} for fiscal year {year} was {format_value(fact['value'], fact['unit'])}.")
+            reasoning.append(f"Reported in the '{fact['label']}' row on page {fact['page']} of {fact['pdf_name']}, fiscal year {year} column.")
+            if fact["pdf_name"] != self._pdf_for(company_year):
+                reasoning.append(f"{year} is read as the fiscal year; the 10-K filed in {year} ({self._pdf_for(company_year)}) covers an earlier fiscal year.")
+            sources.append({"company": company, "year": int(year), "excerpt": fact["excerpt"], "page": fact["page"]})
+        return {
+            "query": userquery,
+            "answer": " ".join(answers),
+            "reasoning": " ".join(reasoning),
+            "sub_queries": [],
+            "sources": sources
+        }
+
+    def _plan(self, userquery):
+        plan = self.planner.plan(userquery) if self.planner is not None else None
+        metrics.count("query.decomposition", source="llm" if plan is None else "planner")
+        return plan
+
+    def _decompose(self, userquery):
+        with metrics.span("query.decomposition"):
+            plan = self._plan(userquery)
+            if plan is not None:
+                return plan
+            return self.llm._call_llm(query_decomposition, userquery, stage="decomposition")
+
+    async def _adecompose(self, userquery):
+        with metrics.span("query.decomposition"):
+            plan = self._plan(userquery)
+            if plan is not None:
+                return plan
+            return await self.llm._acall_llm(query_decomposition, userquery, stage="decomposition")
+
+    def main(self, userquery, on_answer=None):
+        """Answer userquery; with on_answer, the answer text is streamed to it in pieces as it is generated."""
+        with metrics.span("query.total"):
+            return self._main(userquery, on_answer)
+
+    def _main(self, userquery, on_answer=None):
+        self.build_indexes_in_folder("temp", overwrite=False)
+        self.refresh_corpus_index()
+        self.refresh_fact_store()
+        direct = self._direct_answer(userquery)
+        if direct is not None:
+            if on_answer is not None:
+                on_answer(direct["answer"])
+            return direct
+        sub_query_output = self._decompose(userquery)
+        final_input_context = self._build_context(userquery, sub_query_output)
+        if final_input_context is None:
+            return {}
+        chat_prompt = chat_system_prompt.replace("<<query>>", userquery)
+        if on_answer is not None:
+            chat_response = self.llm._stream_llm(chat_prompt, final_input_context, on_answer, stage="answer")
+        else:
+            chat_response = self.llm._call_llm(chat_prompt, final_input_context, stage="answer")
+        return self._final_response(userquery, sub_query_output, chat_response)
+
+    async def amain(self, userquery):
+        """Async main(): LLM round trips are awaited and retrieval runs in a worker thread."""
+        with metrics.span("query.total"):
+            return await self._amain(userquery)
+
+    async def _amain(self, userquery):
+        direct = await asyncio.to_thread(self._direct_answer, userquery)
+        if direct is not None:
+            return direct
+        sub_query_output = await self._adecompose(userquery)
+        final_input_context = await asyncio.to_thread(self._build_context, userquery, sub_query_output)
+        if final_input_context is None:
+            return {}
+        chat_prompt = chat_system_prompt.replace("<<query>>", userquery)
+        chat_response = await self.llm._acall_llm(chat_prompt, final_input_context, stage="answer")
+        return self._final_response(userquery, sub_query_output, chat_response)
+
+    async def aanswer_many(self, questions):
+        await asyncio.to_thread(self.build_indexes_in_folder, "temp", False)
+        await asyncio.to_thread(self.refresh_corpus_index)
+        await asyncio.to_thread(self.refresh_fact_store)
+        return await asyncio.gather(*(self.amain(q) for q in questions))
+
+    def answer_many(self, questions):
+        """Answer a batch of questions concurrently; results keep the order of `questions`."""
+        return asyncio.run(self.aanswer_many(questions))
+
 if __name__ == "__main__":
+    from get_docs import ExtractDocuments
     ExtractDocuments().main()
     obj = PageIndexer()
     questions = [
@@ -200,9 +670,8 @@ if __name__ == "__main__":
         "What percentage of Google's revenue came from cloud in 2023?",
         "Compare AI investments mentioned by all three companies in their 2024 10-Ks"
     ]
-    responses = []
-    for question in questions:
-        output = obj.main(question)
-        responses.append(output)
+    responses = obj.answer_many(questions)
     with open('output.json', 'w') as f:
-        json.dump(responses, f, indent=4, ensure_ascii=False)
\ No newline at end of file
+        json.dump(responses, f, indent=4, ensure_ascii=False)
+    if histograms is not None:
+        print(histograms.render())
\ No newline at end of file
@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+import numpy as np
+from collections import deque
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "tags", "start")
+
+    def __init__(self, metrics, name, tags):
+        self.metrics = metrics
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        tags = self.tags if exc_type is None else {**self.tags, "error": exc_type.__name__}
+        self.metrics._emit("timing", self.name, (time.perf_counter() - self.start) * 1000, tags)
+        return False
+
+
+class Metrics:
+    """Instrumentation front end: timing spans, counters and observed values, fanned out to sinks.
+
+    With no sink attached every call returns immediately (span() hands back a
+    shared no-op context manager), so instrumented code costs nothing when
+    metrics are off. A sink is any object with record(kind, name, value, tags),
+    where kind is "timing" (ms), "count" or "value".
+    """
+
+    def __init__(self):
+        self.sinks = []
+
+    @property
+    def enabled(self):
+        return bool(self.sinks)
+
+    def add_sink(self, sink):
+        self.sinks = self.sinks + [sink]
+        return sink
+
+    def remove_sink(self, sink):
+        self.sinks = [s for s in self.sinks if s is not sink]
+
+    def span(self, name, **tags):
+        if not self.sinks:
+            return _NULL_SPAN
+        return _Span(self, name, tags)
+
+    def count(self, name, value=1, **tags):
+        if self.sinks:
+            self._emit("count", name, value, tags)
+
+    def observe(self, name, value, **tags):
+        if self.sinks:
+            self._emit("value", name, value, tags)
+
+    def _emit(self, kind, name, value, tags):
+        for sink in self.sinks:
+            sink.record(kind, name, value, tags)
+
+
+def series_key(name, tags):
+    tags = {k: v for k, v in tags.items() if v is not None}
+    if not tags:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in sorted(tags.items())) + "}"
+
+
+class HistogramSink:
+    """In-process aggregator: counters plus the last `max_samples` values of each timing/value series."""
+
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self.counters = {}
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind, name, value, tags):
+        key = series_key(name, tags)
+        with self._lock:
+            if kind == "count":
+                self.counters[key] = self.counters.get(key, 0) + value
+            else:
+                samples = self.series.get(key)
+                if samples is None:
+                    samples = self.series[key] = deque(maxlen=self.max_samples)
+                samples.append(value)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+            series = {key: np.asarray(values, dtype=np.float64) for key, values in self.series.items()}
+        summary = {}
+        for key, values in series.items():
+            summary[key] = {
+                "count": int(len(values)),
+                "mean": round(float(values.mean()), 3),
+                "p50": round(float(np.percentile(values, 50)), 3),
+                "p95": round(float(np.percentile(values, 95)), 3),
+                "p99": round(float(np.percentile(values, 99)), 3),
+                "max": round(float(values.max()), 3),
+            }
+        return {"counters": counters, "series": summary}
+
+    def render(self, width=40):
+        """Text report: counters, then a log2-bucketed histogram per series."""
+        with self._lock:
+            counters = dict(self.counters)
+            series = {key: np.asarray(values, dtype=np.float64) for key, values in self.series.items()}
+        lines = []
+        for key in sorted(counters):
+            lines.append(f"{key:<50} {counters[key]}")
+        for key in sorted(series):
+            values = series[key]
+            lines.append(
+                f"\n{key}  n={len(values)} p50={np.percentile(values, 50):.2f} "
+                f"p95={np.percentile(values, 95):.2f} p99={np.percentile(values, 99):.2f} max={values.max():.2f}"
+            )
+            edges = np.exp2(np.arange(np.floor(np.log2(max(values.min(), 1e-3))), np.ceil(np.log2(max(values.max(), 1e-3))) + 1))
+            if len(edges) < 2:
+                edges = np.asarray([edges[0], edges[0] * 2])
+            counts, _ = np.histogram(np.clip(values, edges[0], edges[-1]), bins=edges)
+            peak = counts.max() or 1
+            for lo, hi, n in zip(edges[:-1], edges[1:], counts):
+                lines.append(f"  {lo:>10.3f} - {hi:<10.3f} {'#' * int(round(width * n / peak)):<{width}} {n}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.series.clear()
+
+
+metrics = Metrics()
+# METRICS=1 attaches the in-process histogram aggregator; leave unset for zero-cost no-op instrumentation
+histograms = metrics.add_sink(HistogramSink()) if os.getenv("METRICS", "0") != "0" else None
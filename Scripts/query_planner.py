@@ -0,0 +1,157 @@
+import os
+import re
+import threading
+
+
+class QueryPlanner:
+    """Rule-based replacement for the query_decomposition LLM call.
+
+    Resolves company aliases and years (single years, ranges, FY notation) and
+    "all companies" phrasing into the same decomposition/companies_year/queries
+    structure the LLM returns. plan() returns None when it is not confident, so
+    the caller can fall back to the LLM.
+    """
+
+    ALIASES = {
+        "google": ["google", "alphabet", "googl", "goog"],
+        "microsoft": ["microsoft", "msft"],
+        "nvidia": ["nvidia", "nvda"],
+    }
+    DISPLAY_NAMES = {"google": "Google", "microsoft": "Microsoft", "nvidia": "NVIDIA"}
+    OTHER_COMPANIES = [
+        "amazon", "apple", "meta", "facebook", "ibm", "dell", "tesla", "intel", "amd",
+        "oracle", "netflix", "salesforce", "qualcomm", "broadcom", "openai",
+    ]
+
+    _year = r"(?:19|20)\d{2}"
+    _range = re.compile(
+        rf"\b(?:between\s+(?:fy\s?)?({_year})\s+and\s+|(?:fy\s?)?({_year})\s*(?:-|–|to|through|until)\s*)(?:fy\s?)?({_year})\b", re.I
+    )
+    _single_year = re.compile(rf"(?<!\d)({_year})(?!\d)")
+    _fiscal_short = re.compile(r"\bfy\s?'?(\d{2})\b", re.I)
+    _all_companies = re.compile(
+        r"\b(all(\s+(three|3))?\s+(of\s+the\s+)?(companies|firms)|each\s+(company|of\s+the\s+companies)|"
+        r"every\s+company|which\s+company|across\s+(the\s+)?companies|these\s+companies)\b", re.I
+    )
+    _comparison = re.compile(
+        r"\b(compare|comparison|comparing|versus|vs\.?|relative\s+to|difference|higher|highest|lower|lowest|"
+        r"outperform\w*|better|worse|rank\w*)\b", re.I
+    )
+    _relative_time = re.compile(
+        r"\b(last|previous|prior|this|current|next)\s+(fiscal\s+)?year\b|\b(latest|most\s+recent|recent)\b", re.I
+    )
+
+    def __init__(self, companies=None, min_confidence=None, max_range_years=5):
+        self.companies = list(companies or self.ALIASES)
+        self.min_confidence = min_confidence if min_confidence is not None else float(os.getenv("PLANNER_MIN_CONFIDENCE", "0.8"))
+        self.max_range_years = max_range_years
+        self._alias_patterns = [
+            (company, re.compile(r"\b(" + "|".join(map(re.escape, self.ALIASES.get(company, [company]))) + r")\b", re.I))
+            for company in self.companies
+        ]
+        self._possessive_aliases = {
+            company: re.compile(r"\b(" + "|".join(map(re.escape, self.ALIASES.get(company, [company]))) + r")(?:['’]s)?\b", re.I)
+            for company in self.companies
+        }
+        self._other = re.compile(r"\b(" + "|".join(self.OTHER_COMPANIES) + r")\b", re.I)
+        self._lock = threading.Lock()
+        self.planned = 0
+        self.bypassed = 0
+
+    def _companies(self, query):
+        if self._all_companies.search(query):
+            return list(self.companies), True
+        found = []
+        for company, pattern in self._alias_patterns:
+            match = pattern.search(query)
+            if match:
+                found.append((match.start(), company))
+        return [company for _, company in sorted(found)], False
+
+    def _years(self, query):
+        years = set()
+        for match in self._range.finditer(query):
+            start, end = sorted((int(match.group(1) or match.group(2)), int(match.group(3))))
+            if end - start <= self.max_range_years:
+                years.update(range(start, end + 1))
+            else:
+                years.update((start, end))
+        years.update(int(y) for y in self._single_year.findall(query))
+        years.update(2000 + int(y) for y in self._fiscal_short.findall(query))
+        return sorted(years)
+
+    _connector = r"(?:,|&|\band\b|\bor\b|\bvs\.?|\bversus\b)"
+
+    def _focus(self, query, company):
+        """The query with every other company's name (and the "and"/"," joining it) removed."""
+        for other, pattern in self._possessive_aliases.items():
+            if other != company:
+                query = pattern.sub("\0", query)
+        kept = self._possessive_aliases[company].pattern
+        # a dropped name followed by another name takes the connector after it, the last one the connector before it
+        query = re.sub(rf"\0(?:\s*{self._connector})+\s*(?=\0|{kept})", "", query, flags=re.I)
+        query = re.sub(rf"(?:\s*{self._connector})*\s*\0", " ", query, flags=re.I)
+        return re.sub(r"\s+([?.,!])", r"\1", re.sub(r"\s+", " ", query)).strip()
+
+    def _names_only_in_lists(self, query):
+        """True when every company name is part of a list of names ("Google, Microsoft and NVIDIA").
+
+        _focus can drop a listed name cleanly. A name used alone as subject or object ("Did Microsoft
+        spend more than Google") would leave a sub-query with a hole in it.
+        """
+        spans = sorted(m.span() for pattern in self._possessive_aliases.values() for m in pattern.finditer(query))
+        joined = [
+            re.fullmatch(rf"\s*,?\s*(?:{self._connector}\s*)?", query[a[1]:b[0]], re.I) is not None
+            for a, b in zip(spans, spans[1:])
+        ]
+        return all((i > 0 and joined[i - 1]) or (i < len(joined) and joined[i]) for i in range(len(spans)))
+
+    def analyze(self, query):
+        """Return (decomposition dict, confidence in [0, 1])."""
+        companies, all_companies = self._companies(query)
+        years = self._years(query)
+        comparison = bool(self._comparison.search(query)) or all_companies
+
+        confidence = 1.0
+        if not companies:
+            confidence = 0.0
+        if not years:
+            confidence = min(confidence, 0.3)
+        if self._other.search(query):
+            confidence = min(confidence, 0.2)
+        if self._relative_time.search(query):
+            confidence = min(confidence, 0.4)
+
+        pairs = [(c, y) for c in companies for y in (years or ["unknown"])]
+        if comparison and len(pairs) < 2:
+            confidence = min(confidence, 0.5)
+        if len(companies) > 1 and not all_companies and not self._names_only_in_lists(query):
+            confidence = min(confidence, 0.5)
+
+        if len(pairs) <= 1:
+            plan = {"decomposition": False, "companies_year": [f"{c}_{y}" for c, y in pairs], "queries": []}
+        else:
+            plan = {
+                "decomposition": True,
+                "companies_year": [f"{c}_{y}" for c, y in pairs],
+                "queries": [f"{self.DISPLAY_NAMES.get(c, c.title())} {y}: {self._focus(query, c)}" for c, y in pairs],
+            }
+        return plan, confidence
+
+    def plan(self, query):
+        plan, confidence = self.analyze(query)
+        with self._lock:
+            self.planned += 1
+            if confidence < self.min_confidence:
+                return None
+            self.bypassed += 1
+        return plan
+
+    def stats(self):
+        with self._lock:
+            return {
+                "planned": self.planned,
+                "bypassed": self.bypassed,
+                "llm_fallbacks": self.planned - self.bypassed,
+                "bypass_rate": self.bypassed / self.planned if self.planned else 0.0,
+            }
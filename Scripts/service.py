@@ -0,0 +1,197 @@
+import os
+import json
+import asyncio
+import argparse
+from loguru import logger
+from prompt import chat_system_prompt
+from metrics import metrics, histograms
+
+
+class QueryService:
+    """Long-running wrapper around PageIndexer that keeps the model, Bedrock client and indexes warm.
+
+    Retrieval requests from concurrent queries are queued and collected for up
+    to `batch_window` seconds (or `max_batch` sub-queries), then answered with a
+    single search_many call: one model.encode for every query in the batch and
+    one FAISS search per index. While a batch runs, the next one fills up, so
+    batches grow with load.
+    """
+
+    def __init__(self, indexer=None, batch_window=None, max_batch=None):
+        if indexer is None:
+            from main import PageIndexer
+            indexer = PageIndexer()
+        self.indexer = indexer
+        self.batch_window = batch_window if batch_window is not None else float(os.getenv("SERVICE_BATCH_WINDOW_MS", "5")) / 1000
+        self.max_batch = max_batch or int(os.getenv("SERVICE_MAX_BATCH", "64"))
+        self._queue = None
+        self._batcher = None
+        self.batches = 0
+        self.batched_requests = 0
+        self.queries = 0
+
+    async def start(self, build_indexes=True):
+        if build_indexes:
+            await asyncio.to_thread(self.indexer.build_indexes_in_folder, "temp", False)
+            await asyncio.to_thread(self.indexer.refresh_corpus_index)
+            await asyncio.to_thread(self.indexer.refresh_fact_store)
+        await asyncio.to_thread(self.indexer.warm_up)
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_loop())
+        return self
+
+    async def stop(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def search(self, requests, top_k=None):
+        """Page scores for (pdf_name, query) pairs, answered as part of the next micro-batch."""
+        if not requests:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((requests, top_k or self.indexer.retrieval_top_k, future))
+        return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.batch_window
+            while size < self.max_batch:
+                if not self._queue.empty():
+                    item = self._queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                batch.append(item)
+                size += len(item[0])
+            await self._run_batch(batch)
+
+    async def _run_batch(self, batch):
+        by_top_k = {}
+        for item in batch:
+            by_top_k.setdefault(item[1], []).append(item)
+        for top_k, items in by_top_k.items():
+            flat = [r for requests, _, _ in items for r in requests]
+            self.batches += 1
+            self.batched_requests += len(flat)
+            metrics.observe("service.batch_size", len(flat))
+            try:
+                results = await asyncio.to_thread(self.indexer.search_many, flat, top_k)
+            except Exception as e:
+                for _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            offset = 0
+            for requests, _, future in items:
+                if not future.done():
+                    future.set_result(results[offset:offset + len(requests)])
+                offset += len(requests)
+
+    async def answer(self, userquery):
+        """Same result as PageIndexer.main(userquery), with retrieval micro-batched across concurrent calls."""
+        self.queries += 1
+        with metrics.span("query.total"):
+            direct = await asyncio.to_thread(self.indexer._direct_answer, userquery)
+            if direct is not None:
+                return direct
+            sub_query_output = await self.indexer._adecompose(userquery)
+            requests = self.indexer._retrieval_requests(userquery, sub_query_output)
+            if requests is None:
+                return {}
+            with metrics.span("query.retrieval"):
+                results = await self.search(requests)
+            final_input_context = await asyncio.to_thread(self.indexer._assemble_context, requests, results)
+            chat_prompt = chat_system_prompt.replace("<<query>>", userquery)
+            chat_response = await self.indexer.llm._acall_llm(chat_prompt, final_input_context, stage="answer")
+            return self.indexer._final_response(userquery, sub_query_output, chat_response)
+
+    async def answer_many(self, questions):
+        return await asyncio.gather(*(self.answer(q) for q in questions))
+
+    def stats(self):
+        return {
+            "queries": self.queries,
+            "batches": self.batches,
+            "batched_requests": self.batched_requests,
+            "mean_batch_size": self.batched_requests / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+    # Minimal HTTP/1.1 front end: POST /query {"query": "..."} or {"queries": [...]}, GET /health, GET /metrics
+    async def _handle(self, reader, writer):
+        status, payload = 200, None
+        try:
+            method, path, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            if method == "GET" and path == "/health":
+                payload = {"status": "ok", **self.stats()}
+            elif method == "GET" and path == "/metrics":
+                payload = histograms.snapshot() if histograms is not None else {}
+            elif method == "POST" and path == "/query":
+                request = json.loads(body or b"{}")
+                if "queries" in request:
+                    payload = await self.answer_many(request["queries"])
+                else:
+                    payload = await self.answer(request["query"])
+            else:
+                status, payload = 404, {"error": f"Unknown route {method} {path}"}
+        except (ValueError, KeyError) as e:
+            status, payload = 400, {"error": f"Bad request: {e}"}
+        except Exception as e:
+            logger.error(f"Query failed | ERROR: {str(e)}")
+            status, payload = 500, {"error": str(e)}
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}[status]
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8080):
+        server = await asyncio.start_server(self._handle, host, port)
+        logger.info(f"Query service listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+async def _run(host, port):
+    async with QueryService() as service:
+        await service.serve(host, port)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve PageIndexer queries over HTTP with micro-batched retrieval.")
+    parser.add_argument("--host", default=os.getenv("SERVICE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVICE_PORT", "8080")))
+    args = parser.parse_args()
+    asyncio.run(_run(args.host, args.port))
@@ -0,0 +1,235 @@
+import re
+import json
+import time
+import zlib
+import base64
+import struct
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def default_bedrock_responder(body):
+    if body.get("system", "").startswith("Given a user query"):
+        return json.dumps({"decomposition": False, "companies_year": [], "queries": []})
+    return json.dumps({"answer": "stub answer", "reasoning": "stub reasoning", "source": []})
+
+
+def encode_event_message(event_type, payload):
+    """Encode one application/vnd.amazon.eventstream message (as used by InvokeModelWithResponseStream)."""
+    headers = b""
+    for name, value in ((":event-type", event_type), (":content-type", "application/json"), (":message-type", "event")):
+        name, value = name.encode("utf-8"), value.encode("utf-8")
+        headers += struct.pack(">B", len(name)) + name + b"\x07" + struct.pack(">H", len(value)) + value
+    prelude = struct.pack(">II", 12 + len(headers) + len(payload) + 4, len(headers))
+    message = prelude + struct.pack(">I", zlib.crc32(prelude)) + headers + payload
+    return message + struct.pack(">I", zlib.crc32(message))
+
+
+class StubServer:
+    """Run a ThreadingHTTPServer on a free localhost port in a background thread."""
+
+    def __init__(self, handler_cls, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), handler_cls)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _BedrockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes; without this, Nagle + delayed ACK adds ~40ms per call
+    disable_nagle_algorithm = True
+    invoke_path = re.compile(r"^/model/(?P<model>[^/]+)/invoke(?P<stream>-with-response-stream)?$")
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        match = self.invoke_path.match(self.path)
+        if not match:
+            return self._send(404, {"message": f"Unknown path {self.path}"})
+        if stub.should_throttle():
+            return self._send(429, {"message": "Too many requests"}, {"x-amzn-ErrorType": "ThrottlingException"})
+        if stub.latency:
+            time.sleep(stub.latency)
+        text = stub.responder(body)
+        usage = {"input_tokens": len(json.dumps(body)) // 4, "output_tokens": len(text) // 4}
+        if match.group("stream"):
+            return self._stream(text, usage)
+        self._send(200, {
+            "id": "msg_stub",
+            "type": "message",
+            "role": "assistant",
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "usage": usage,
+        })
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, text, usage):
+        stub = self.server.stub
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        step = stub.stream_chunk_chars
+        events = [{"type": "message_start", "message": {"role": "assistant", "usage": {"input_tokens": usage["input_tokens"]}}},
+                  {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}]
+        events += [{"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": text[i:i + step]}}
+                   for i in range(0, len(text), step)]
+        events += [{"type": "content_block_stop", "index": 0},
+                   {"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": usage["output_tokens"]}},
+                   {"type": "message_stop"}]
+        for event in events:
+            payload = json.dumps({"bytes": base64.b64encode(json.dumps(event).encode("utf-8")).decode("ascii")})
+            self._write_chunk(encode_event_message("chunk", payload.encode("utf-8")))
+            if stub.stream_delay and event["type"] == "content_block_delta":
+                time.sleep(stub.stream_delay)
+        self._write_chunk(b"")
+
+
+class BedrockStubServer(StubServer):
+    """Local stand-in for the bedrock-runtime InvokeModel API.
+
+    Point LLM at it with BEDROCK_ENDPOINT_URL=<server.url>. `latency` adds a fixed
+    delay per call and `throttle_every=n` answers every n-th call with a 429
+    ThrottlingException. Streaming calls send the text in `stream_chunk_chars`
+    pieces, `stream_delay` seconds apart.
+    """
+
+    def __init__(self, responder=None, latency=0.0, throttle_every=0, stream_chunk_chars=16, stream_delay=0.0, **kwargs):
+        super().__init__(_BedrockHandler, **kwargs)
+        self.stream_chunk_chars = stream_chunk_chars
+        self.stream_delay = stream_delay
+        self.responder = responder or default_bedrock_responder
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.calls = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def should_throttle(self):
+        with self._lock:
+            self.calls += 1
+            if self.throttle_every and self.calls % self.throttle_every == 0:
+                self.throttled += 1
+                return True
+            return False
+
+
+class _SecApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        stub = self.server.stub
+        query = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        match = re.search(r'cik:"(\d+)"', query.get("query", ""))
+        filings = stub.filings.get(match.group(1), []) if match else []
+        start, size = query.get("from", 0), query.get("size", 50)
+        with stub.lock:
+            stub.query_calls += 1
+        self._send_json(200, {"total": {"value": len(filings)}, "filings": filings[start:start + size]})
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urlparse(self.path)
+        if url.path != "/filing-reader":
+            return self._send_json(404, {"message": f"Unknown path {url.path}"})
+        filing_url = parse_qs(url.query).get("url", [""])[0]
+        data = stub.documents.get(filing_url)
+        if data is None:
+            return self._send_json(404, {"message": "Filing not found"})
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header:
+            start = int(re.match(r"bytes=(\d+)-", range_header).group(1))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        body = data[start:]
+        with stub.lock:
+            stub.download_calls += 1
+            cut = stub.interrupt_after.pop(filing_url, None)
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(body)))
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        self.end_headers()
+        if cut is not None:
+            # simulate a dropped connection part-way through the body
+            self.wfile.write(body[:cut])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+class SecApiStubServer(StubServer):
+    """Local stand-in for the sec-api.io Query API and filing-reader PDF endpoint.
+
+    `filings` maps CIK -> list of filing dicts (accessionNo, linkToFilingDetails,
+    filedAt); `documents` maps linkToFilingDetails -> PDF bytes. Use with
+    SEC_API_BASE_URL=<server.url>. `interrupt_after[url] = n` cuts the next
+    download of that filing after n bytes.
+    """
+
+    def __init__(self, filings=None, documents=None, **kwargs):
+        super().__init__(_SecApiHandler, **kwargs)
+        self.filings = filings or {}
+        self.documents = documents or {}
+        self.interrupt_after = {}
+        self.lock = threading.Lock()
+        self.query_calls = 0
+        self.download_calls = 0
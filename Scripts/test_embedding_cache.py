@@ -0,0 +1,36 @@
+import numpy as np
+from embedding_cache import EmbeddingCache
+
+
+def _encode(texts):
+    return np.array([[float(len(t)), 1.0, 2.0, 3.0] for t in texts], dtype=np.float32)
+
+
+def test_hits_skip_the_encoder(tmp_path):
+    cache = EmbeddingCache(tmp_path, "model-a")
+    cache.encode(["alpha", "beta"], _encode)
+    calls = []
+    out = cache.encode(["beta", "gamma", "alpha"], lambda texts: calls.append(texts) or _encode(texts))
+    assert calls == [["gamma"]]
+    assert out[:, 0].tolist() == [4.0, 5.0, 5.0]
+
+
+def test_size_cap_evicts_oldest_entries(tmp_path):
+    row_bytes = 16 + 4 * 4
+    cache = EmbeddingCache(tmp_path, "model-a", max_bytes=3 * row_bytes)
+    for text in ["one", "two", "three", "four"]:
+        cache.encode([text], _encode)
+    assert cache.stats()["entries"] == 3
+    reopened = EmbeddingCache(tmp_path, "model-a", max_bytes=3 * row_bytes)
+    calls = []
+    reopened.encode(["one", "four"], lambda texts: calls.append(texts) or _encode(texts))
+    assert calls == [["one"]]
+
+
+def test_compaction_drops_other_models(tmp_path):
+    EmbeddingCache(tmp_path, "model-a").encode(["alpha"], _encode)
+    cache = EmbeddingCache(tmp_path, "model-b", max_shards=1)
+    cache.encode(["alpha"], _encode)
+    cache.encode(["beta"], _encode)
+    assert [p.name for p in tmp_path.iterdir()] == ["model-b"]
+    assert cache.stats()["shards"] == 1
@@ -0,0 +1,113 @@
+import pytest
+from fact_store import SEGMENTS, extract_facts, metric_for_query
+
+# Row layouts as they come out of clean_text on the FY2023 10-Ks
+MSFT_STATEMENT = (
+    "PART II Item 8 INCOME STATEMENTS (In millions, except per share amounts) Year Ended June 30, 2023 2022 2021 "
+    "Revenue: Product $ 64,699 $ 72,732 $ 71,074 Service and other 147,216 125,538 97,014 "
+    "Total revenue 211,915 198,270 168,088 Cost of revenue: Product 17,804 19,064 18,219 "
+    "Service and other 48,059 43,586 34,013 Total cost of revenue 65,863 62,650 52,232 "
+    "Gross margin 146,052 135,620 115,856 Operating income 88,523 83,383 69,916 "
+    "Net income $ 72,361 $ 72,738 $ 61,271 Earnings per share: Basic $ 9.72 $ 9.70 $ 8.12"
+)
+MSFT_SEGMENTS = (
+    "(In millions) Year Ended June 30, 2023 2022 2021 Revenue Productivity and Business Processes "
+    "$ 69,274 $ 63,364 $ 53,915 Intelligent Cloud 87,907 74,965 59,728 More Personal Computing 54,734 59,941 54,445 "
+    "Total $ 211,915 $ 198,270 $ 168,088 Operating Income Productivity and Business Processes $ 34,189 $ 29,690 $ 24,351 "
+    "Intelligent Cloud 37,884 33,203 26,126 More Personal Computing 16,450 20,490 19,439 Total $ 88,523 $ 83,383 $ 69,916"
+)
+MSFT_GEOGRAPHY = (
+    "(In millions) Year Ended June 30, 2023 2022 2021 United States $ 106,744 $ 100,218 $ 83,953 "
+    "Other countries 105,171 98,052 84,135 Total $ 211,915 $ 198,270 $ 168,088 "
+    "Revenue, classified by significant product and service offerings, was as follows: "
+    "(In millions) Year Ended June 30, 2023 2022 2021 Server products and cloud services $ 79,970 $ 67,350 $ 52,589 "
+    "Office products and cloud services 48,728 44,862 39,872 Total $ 211,915 $ 198,270 $ 168,088"
+)
+GOOGL_SEGMENTS = (
+    "(in millions) Year Ended December 31, 2020 2021 2022 Revenues: Google Services $ 168,635 $ 237,529 $ 253,528 "
+    "Google Cloud 13,059 19,206 26,280 Other Bets 657 753 1,068 Hedging gains (losses) 176 149 1,960 "
+    "Total revenues $ 182,527 $ 257,637 $ 282,836 Operating income (loss): Google Services $ 54,606 $ 91,855 $ 82,699 "
+    "Google Cloud (5,607) (3,099) (2,968) Other Bets (4,476) (5,281) (4,636)"
+)
+NVDA_SEGMENTS = (
+    "Revenue by Reportable Segments ($ in millions) Year Ended Jan 29, 2023 Jan 30, 2022 $ Change % Change "
+    "Compute & Networking $ 15,068 $ 11,046 $ 4,022 36 % Graphics 11,906 15,868 (3,962) (25) % "
+    "Total $ 26,974 $ 26,914 $ 60 — %"
+)
+
+
+def _facts(pages, ticker):
+    return {(f["metric"], f["fiscal_year"]): f for f in extract_facts(pages, SEGMENTS[ticker])}
+
+
+def test_income_statement_rows():
+    facts = _facts({40: MSFT_STATEMENT}, "MSFT")
+    assert facts[("total_revenue", 2023)]["value"] == 211915
+    assert facts[("total_revenue", 2021)]["value"] == 168088
+    assert facts[("operating_income", 2022)]["value"] == 83383
+    assert facts[("net_income", 2023)]["value"] == 72361
+    assert facts[("total_revenue", 2023)]["unit"] == "millions"
+
+
+def test_cost_of_revenue_is_not_revenue():
+    facts = _facts({40: MSFT_STATEMENT}, "MSFT")
+    assert facts[("total_revenue", 2023)]["label"] == "Total revenue"
+
+
+def test_statement_row_preferred_over_other_totals():
+    facts = _facts({12: MSFT_GEOGRAPHY, 40: MSFT_STATEMENT, 90: MSFT_SEGMENTS}, "MSFT")
+    assert facts[("total_revenue", 2023)]["page"] == 40
+    assert facts[("operating_income", 2023)]["page"] == 40
+
+
+def test_bare_total_and_segments_take_section_heading():
+    facts = _facts({90: MSFT_SEGMENTS}, "MSFT")
+    assert facts[("total_revenue", 2023)]["value"] == 211915
+    assert facts[("operating_income", 2023)]["value"] == 88523
+    assert facts[("segment_revenue:Intelligent Cloud", 2023)]["value"] == 87907
+    assert facts[("segment_operating_income:Intelligent Cloud", 2021)]["value"] == 26126
+
+
+def test_ascending_years_and_negative_values():
+    facts = _facts({5: GOOGL_SEGMENTS}, "GOOGL")
+    assert facts[("total_revenue", 2022)]["value"] == 282836
+    assert facts[("total_revenue", 2020)]["value"] == 182527
+    assert facts[("segment_revenue:Google Cloud", 2022)]["value"] == 26280
+    assert facts[("segment_operating_income:Google Cloud", 2020)]["value"] == -5607
+
+
+def test_change_columns_ignored():
+    facts = _facts({7: NVDA_SEGMENTS}, "NVDA")
+    assert facts[("segment_revenue:Compute & Networking", 2023)]["value"] == 15068
+    assert facts[("segment_revenue:Graphics", 2022)]["value"] == 15868
+    assert facts[("total_revenue", 2023)]["value"] == 26974
+    assert ("total_revenue", 2021) not in facts
+
+
+@pytest.mark.parametrize("query, company, metric", [
+    ("What was Microsoft's total revenue in 2023?", "MSFT", "total_revenue"),
+    ("What was Microsoft's revenue in 2023?", "MSFT", "total_revenue"),
+    ("What were Google's 2022 revenues?", "GOOGL", "total_revenue"),
+    ("What was NVIDIA's operating income in 2023?", "NVDA", "operating_income"),
+    ("What was Google's net income in 2022?", "GOOGL", "net_income"),
+    ("What was NVIDIA's Data Center revenue in fiscal 2023?", "NVDA", "segment_revenue:Data Center"),
+    ("How much revenue did Microsoft's Intelligent Cloud segment generate in 2023?", "MSFT", "segment_revenue:Intelligent Cloud"),
+    ("What was Google Cloud operating income in 2022?", "GOOGL", "segment_operating_income:Google Cloud"),
+])
+def test_direct_metric_questions(query, company, metric):
+    assert metric_for_query(query, company) == metric
+
+
+@pytest.mark.parametrize("query, company", [
+    ("What was Microsoft's Azure revenue in 2023?", "MSFT"),
+    ("What was Google's advertising revenue in 2023?", "GOOGL"),
+    ("What was NVIDIA's revenue from China in 2023?", "NVDA"),
+    ("What was Microsoft's revenue in Q3 2023?", "MSFT"),
+    ("What was Microsoft's cost of revenue in 2023?", "MSFT"),
+    ("How much unearned revenue did Microsoft report in 2023?", "MSFT"),
+    ("How did NVIDIA's data center revenue grow from 2022 to 2023?", "NVDA"),
+    ("What was Microsoft's revenue and net income in 2023?", "MSFT"),
+    ("What was Google's operating margin in 2023?", "GOOGL"),
+])
+def test_qualified_or_analytical_questions_need_retrieval(query, company):
+    assert metric_for_query(query, company) is None
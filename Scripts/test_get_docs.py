@@ -0,0 +1,50 @@
+import os
+import pytest
+import requests
+from get_docs import ExtractDocuments
+from stub_servers import SecApiStubServer
+
+PDF = b"%PDF-1.4\n" + b"x" * 200_000 + b"\n%%EOF\n"
+FILINGS = [
+    {"accessionNo": f"0000789019-2{i}", "linkToFilingDetails": f"https://sec.example/msft-{i}", "filedAt": f"202{i}-07-28"}
+    for i in range(2, 5)
+]
+
+
+@pytest.fixture
+def sec(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with SecApiStubServer(filings={"789019": FILINGS}, documents={f["linkToFilingDetails"]: PDF for f in FILINGS}) as server:
+        monkeypatch.setenv("SEC_API_BASE_URL", server.url)
+        monkeypatch.setenv("API_KEY", "test")
+        yield server
+
+
+def test_query_goes_through_session_and_pages(sec):
+    docs = ExtractDocuments()
+    sent = []
+    post = docs.session.post
+    docs.session.post = lambda *args, **kwargs: sent.append(kwargs["json"]) or post(*args, **kwargs)
+    filings = docs.get_filings("789019", "10-K", 2022, 2024)
+    assert [f["accessionNo"] for f in filings] == [f["accessionNo"] for f in FILINGS]
+    assert sent and sent[0]["query"].startswith('cik:"789019"')
+    assert sec.query_calls == len(sent)
+
+
+def test_interrupted_download_resumes(sec):
+    docs = ExtractDocuments()
+    sec.interrupt_after[FILINGS[0]["linkToFilingDetails"]] = 50_000
+    docs._download_job("MSFT", FILINGS[0]["accessionNo"], FILINGS[0]["linkToFilingDetails"], "MSFT_2022.pdf")
+    with open(os.path.join("temp", "MSFT_2022.pdf"), "rb") as f:
+        assert f.read() == PDF
+    assert sec.download_calls == 2
+
+
+def test_http_errors_are_not_retried(sec):
+    docs = ExtractDocuments()
+    calls = []
+    download = docs.download_pdf
+    docs.download_pdf = lambda *args: calls.append(args) or download(*args)
+    with pytest.raises(requests.HTTPError):
+        docs._download_job("MSFT", "missing", "https://sec.example/missing", "MSFT_1999.pdf")
+    assert len(calls) == 1
@@ -0,0 +1,53 @@
+import pytest
+from query_planner import QueryPlanner
+
+
+@pytest.fixture
+def planner():
+    return QueryPlanner(min_confidence=0.8)
+
+
+@pytest.mark.parametrize("query, queries", [
+    ("Compare Google and Microsoft revenue in 2023", [
+        "Google 2023: Compare Google revenue in 2023",
+        "Microsoft 2023: Compare Microsoft revenue in 2023",
+    ]),
+    ("Compare Google's, Microsoft's and NVIDIA's operating income in 2023.", [
+        "Google 2023: Compare Google's operating income in 2023.",
+        "Microsoft 2023: Compare Microsoft's operating income in 2023.",
+        "NVIDIA 2023: Compare NVIDIA's operating income in 2023.",
+    ]),
+    ("How did Microsoft vs. NVIDIA net income change in FY2023?", [
+        "Microsoft 2023: How did Microsoft net income change in FY2023?",
+        "NVIDIA 2023: How did NVIDIA net income change in FY2023?",
+    ]),
+    ("Which had higher R&D spending in 2022, Google or Microsoft?", [
+        "Google 2022: Which had higher R&D spending in 2022, Google?",
+        "Microsoft 2022: Which had higher R&D spending in 2022, Microsoft?",
+    ]),
+])
+def test_comparative_sub_queries(planner, query, queries):
+    plan = planner.plan(query)
+    assert plan is not None
+    assert plan["decomposition"] is True
+    assert plan["queries"] == queries
+
+
+@pytest.mark.parametrize("query", [
+    "Did Microsoft spend more on R&D than Google in 2023?",
+    "What was the revenue of Microsoft in 2023 and how does it compare with Google?",
+    "How did NVIDIA revenue vs. Microsoft revenue change in 2023?",
+])
+def test_names_outside_a_list_fall_back_to_llm(planner, query):
+    _, confidence = planner.analyze(query)
+    assert confidence < planner.min_confidence
+    assert planner.plan(query) is None
+
+
+@pytest.mark.parametrize("query, companies_year", [
+    ("What was Microsoft's revenue in FY2023?", ["microsoft_2023"]),
+    ("What was NVIDIA's operating income in fy23?", ["nvidia_2023"]),
+    ("Google net income FY2021-FY2022", ["google_2021", "google_2022"]),
+])
+def test_years(planner, query, companies_year):
+    assert planner.plan(query)["companies_year"] == companies_year
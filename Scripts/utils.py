@@ -1,5 +1,11 @@
+import os
 import re
-from PyPDF2 import PdfReader
+import math
+import hashlib
+import functools
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
 _ws = re.compile(r"\s+")
 def clean_text(s: str) -> str:
@@ -7,10 +13,195 @@ def clean_text(s: str) -> str:
         return ""
     return _ws.sub(" ", s).strip()
 
-def load_pdf_pages(pdf_path):
-    reader = PdfReader(str(pdf_path))
-    pages = []
-    for p in reader.pages:
-        txt = p.extract_text() or ""
-        pages.append(clean_text(txt))
-    return pages
\ No newline at end of file
+class PDFExtractor:
+    """Page-text extraction backend. iter_pages() yields cleaned page texts in order."""
+    name = None
+
+    def page_count(self, pdf_path):
+        raise NotImplementedError
+
+    def extract_range(self, pdf_path, start, end):
+        raise NotImplementedError
+
+    def iter_pages(self, pdf_path, start=0, end=None, workers=1):
+        end = self.page_count(pdf_path) if end is None else end
+        if workers <= 1 or end - start < 2 * workers:
+            for txt in self.extract_range(pdf_path, start, end):
+                yield clean_text(txt)
+            return
+        step = math.ceil((end - start) / workers)
+        starts = list(range(start, end, step))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(
+                _extract_range,
+                [self.name] * len(starts),
+                [str(pdf_path)] * len(starts),
+                starts,
+                [min(s + step, end) for s in starts]
+            )
+            for pages in results:
+                yield from pages
+
+class PyPDF2Extractor(PDFExtractor):
+    name = "pypdf2"
+
+    def page_count(self, pdf_path):
+        from PyPDF2 import PdfReader
+        return len(PdfReader(str(pdf_path)).pages)
+
+    def extract_range(self, pdf_path, start, end):
+        from PyPDF2 import PdfReader
+        reader = PdfReader(str(pdf_path))
+        for p in reader.pages[start:end]:
+            yield p.extract_text() or ""
+
+class PyMuPDFExtractor(PDFExtractor):
+    name = "pymupdf"
+
+    def page_count(self, pdf_path):
+        import pymupdf
+        with pymupdf.open(str(pdf_path)) as doc:
+            return doc.page_count
+
+    def extract_range(self, pdf_path, start, end):
+        import pymupdf
+        with pymupdf.open(str(pdf_path)) as doc:
+            for i in range(start, min(end, doc.page_count)):
+                yield doc[i].get_text("text")
+
+EXTRACTORS = {e.name: e for e in (PyMuPDFExtractor, PyPDF2Extractor)}
+
+def get_extractor(name=None):
+    name = (name or os.getenv("PDF_BACKEND", "pymupdf")).lower()
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown PDF backend '{name}'. Use one of: {', '.join(EXTRACTORS)}.")
+    return EXTRACTORS[name]()
+
+def _extract_range(name, pdf_path, start, end):
+    return [clean_text(t) for t in get_extractor(name).extract_range(pdf_path, start, end)]
+
+def iter_pdf_pages(pdf_path, backend=None, workers=1):
+    return get_extractor(backend).iter_pages(pdf_path, workers=workers)
+
+def load_pdf_pages(pdf_path, backend=None):
+    return list(iter_pdf_pages(pdf_path, backend=backend))
+
+def chunk_text(text, max_len=512, overlap=50):
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_len, len(text))
+        chunks.append(text[start:end])
+        if end == len(text):
+            break
+        start += max_len - overlap
+    return chunks
+
+# candidate chunk boundaries: after a sentence, or between a number and the capitalised label of the next table row
+_unit_break = re.compile(r"(?<=[.!?;])\s+(?=[\"'(\[$A-Z0-9])|(?<=[\d)%])\s+(?=[A-Z][A-Za-z&])")
+_word = re.compile(r"\S+\s*")
+
+@functools.lru_cache(maxsize=None)
+def load_tokenizer(name):
+    try:
+        from transformers import AutoTokenizer
+    except ImportError as e:
+        raise ImportError("CHUNK_STRATEGY=tokens requires `pip install transformers` (installed with sentence-transformers).") from e
+    tokenizer = AutoTokenizer.from_pretrained(name, use_fast=True)
+    if not tokenizer.is_fast:
+        raise ValueError(f"No fast tokenizer for '{name}'; use CHUNK_STRATEGY=chars.")
+    return tokenizer
+
+def token_starts(tokenizer, texts, batch_size=64):
+    """Character offset of every token of each text, from batched fast-tokenizer calls."""
+    starts = []
+    for i in range(0, len(texts), batch_size):
+        enc = tokenizer(
+            texts[i:i + batch_size], add_special_tokens=False, return_offsets_mapping=True,
+            return_attention_mask=False, return_token_type_ids=False, verbose=False
+        )
+        starts.extend(np.fromiter((s for s, _ in offsets), dtype=np.int64, count=len(offsets)) for offsets in enc["offset_mapping"])
+    return starts
+
+def chunk_text_tokens(text, starts, max_tokens=256, overlap_tokens=32):
+    """Pack whole sentences and table rows into chunks of at most max_tokens tokens.
+
+    `starts` are the token offsets of `text`. A unit longer than the budget is
+    split between words. Each chunk after the first repeats the whole trailing
+    units of the previous chunk that fit in overlap_tokens, so chunks always
+    begin at a sentence or row. Returns (chunks, token counts, overlap
+    characters per chunk); ChunkStore.page_text uses the last to rebuild the page.
+    """
+    def tokens(a, b):
+        return int(np.searchsorted(starts, b) - np.searchsorted(starts, a))
+
+    breaks = [0] + [m.end() for m in _unit_break.finditer(text)] + [len(text)]
+    bounds = [0]
+    for a, b in zip(breaks, breaks[1:]):
+        if tokens(a, b) > max_tokens:
+            bounds.extend(m.end() for m in _word.finditer(text, a, b))
+        else:
+            bounds.append(b)
+    n = len(bounds) - 1
+
+    chunks, counts, overlaps = [], [], []
+    head = new = 0  # first unit of the chunk (overlap included) / first unit not yet in any chunk
+    while new < n:
+        while head < new and tokens(bounds[head], bounds[new + 1]) > max_tokens:
+            head += 1
+        end = new + 1
+        while end < n and tokens(bounds[head], bounds[end + 1]) <= max_tokens:
+            end += 1
+        chunks.append(text[bounds[head]:bounds[end]])
+        counts.append(tokens(bounds[head], bounds[end]))
+        overlaps.append(bounds[new] - bounds[head])
+        head = end
+        while head > new and tokens(bounds[head - 1], bounds[end]) <= overlap_tokens:
+            head -= 1
+        new = end
+    return chunks, counts, overlaps
+
+def extract_page_chunks(pdf_path, min_chars_per_page=40, max_len=512, overlap=50, backend=None, workers=1,
+                        strategy="chars", max_tokens=256, overlap_tokens=32, tokenizer=None, batch_size=64):
+    """Chunk records ({"page", "text"}, plus "tokens" and "overlap" with the tokens strategy) of every page with enough text.
+
+    strategy="chars" cuts fixed max_len-character windows; strategy="tokens"
+    packs sentences and table rows up to max_tokens tokens of `tokenizer`.
+    Pages are chunked as extraction yields them, batch_size pages per tokenizer call.
+    """
+    pages = ((i, t) for i, t in enumerate(iter_pdf_pages(pdf_path, backend=backend, workers=workers), start=1)
+             if len(t) >= min_chars_per_page)
+    records = []
+    if strategy == "tokens":
+        tok = load_tokenizer(tokenizer)
+        budget = max_tokens - tok.num_special_tokens_to_add()
+        while batch := list(itertools.islice(pages, batch_size)):
+            for (i, t), starts in zip(batch, token_starts(tok, [t for _, t in batch], batch_size=batch_size)):
+                chunks, counts, overlaps = chunk_text_tokens(t, starts, max_tokens=budget, overlap_tokens=overlap_tokens)
+                records.extend(
+                    {"page": i, "text": chunk, "tokens": n, "overlap": o} for chunk, n, o in zip(chunks, counts, overlaps)
+                )
+        return records
+    for i, t in pages:
+        for chunk in chunk_text(t, max_len=max_len, overlap=overlap):
+            records.append({"page": i, "text": chunk})
+    return records
+
+def chunk_stats(records):
+    chars = np.asarray([len(r["text"]) for r in records], dtype=np.float64)
+    stats = {"chunks": len(records), "mean_chars": round(float(chars.mean()), 1) if len(chars) else 0.0}
+    if records and "tokens" in records[0]:
+        tokens = np.asarray([r["tokens"] for r in records], dtype=np.float64)
+        stats.update({
+            "mean_tokens": round(float(tokens.mean()), 1),
+            "p95_tokens": round(float(np.percentile(tokens, 95)), 1),
+            "max_tokens": int(tokens.max()),
+        })
+    return stats
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,156 @@
+import os
+import numpy as np
+from pathlib import Path
+from loguru import logger
+
+INDEX_TYPES = ("flat", "sq8", "pq", "ivfpq")
+
+
+def index_config(index_type=None):
+    """Per-filing index settings from the environment; stored in the index fingerprint."""
+    index_type = (index_type or os.getenv("INDEX_TYPE", "flat")).lower()
+    config = {
+        "type": index_type,
+        "pq_m": int(os.getenv("INDEX_PQ_M", "0")),
+        "pq_nbits": int(os.getenv("INDEX_PQ_NBITS", "8")),
+        "nlist": int(os.getenv("INDEX_NLIST", "64")),
+        # re-ranking keeps a float32 copy of the vectors on disk; sq8 recall is close enough to exact without it
+        "rerank": int(os.getenv("INDEX_RERANK_FACTOR", "0" if index_type == "sq8" else "4")),
+    }
+    if config["type"] not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{config['type']}'. Use one of: {', '.join(INDEX_TYPES)}.")
+    return config
+
+
+def vectors_path_for(idx_path):
+    return Path(idx_path).with_suffix(".vectors.npy")
+
+
+def _default_pq_m(dim):
+    # about 8 dims per sub-quantizer, i.e. dim bytes -> dim/8 bytes per vector at 8 bits
+    target = max(1, dim // 8)
+    return max(m for m in range(1, target + 1) if dim % m == 0)
+
+
+def build_index(embs, config):
+    """Train and fill a faiss index for `embs`; returns (index, params actually used).
+
+    Filings too small to train the requested quantizer fall back to fewer PQ
+    bits, then to sq8, so params["type"] can differ from config["type"].
+    """
+    import faiss
+    embs = np.ascontiguousarray(embs, dtype=np.float32)
+    n, dim = embs.shape
+    index_type = config["type"]
+    params = {"type": index_type}
+
+    if index_type in ("pq", "ivfpq"):
+        m = config["pq_m"] or _default_pq_m(dim)
+        if dim % m:
+            raise ValueError(f"INDEX_PQ_M={m} does not divide the embedding dimension {dim}.")
+        nbits = min(config["pq_nbits"], int(np.log2(max(n, 1))))
+        if nbits < 4:
+            logger.info(f"{n} vectors are too few to train {index_type}; using sq8")
+            index_type = params["type"] = "sq8"
+        else:
+            params.update(pq_m=m, pq_nbits=nbits)
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+    elif index_type == "pq":
+        index = faiss.IndexPQ(dim, params["pq_m"], params["pq_nbits"], faiss.METRIC_INNER_PRODUCT)
+    else:
+        nlist = max(1, min(config["nlist"], n // 39))
+        params["nlist"] = nlist
+        index = faiss.IndexIVFPQ(faiss.IndexFlatIP(dim), dim, nlist, params["pq_m"], params["pq_nbits"], faiss.METRIC_INNER_PRODUCT)
+    if not index.is_trained:
+        # a single filing rarely has the 39 points per centroid faiss asks for; silence that warning
+        for holder in (index, getattr(index, "pq", None)):
+            if holder is not None and hasattr(holder, "cp"):
+                holder.cp.min_points_per_centroid = 1
+        index.train(embs)
+    index.add(embs)
+    return index, params
+
+
+class VectorIndex:
+    """A faiss index plus optional exact vectors for re-ranking its candidates.
+
+    Compressed indexes return rerank * k candidates, which are re-scored against
+    the float32 vectors in `<pdf>.vectors.npy`. That file is memory-mapped, so
+    only the candidate rows are read; the resident part is the compressed index.
+    """
+
+    def __init__(self, index, vectors=None, rerank=0, nprobe=None):
+        self.index = index
+        self.vectors = vectors
+        self.rerank = rerank if vectors is not None else 0
+        if nprobe is not None:
+            import faiss
+            if isinstance(index, faiss.IndexIVF):
+                index.nprobe = nprobe
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal
+
+    @classmethod
+    def write(cls, idx_path, embs, config):
+        """Build, write and return (VectorIndex, params) for one filing."""
+        import faiss
+        index, params = build_index(embs, config)
+        tmp = Path(idx_path).with_name(Path(idx_path).name + ".tmp")
+        faiss.write_index(index, str(tmp))
+        os.replace(tmp, idx_path)
+        vectors_path = vectors_path_for(idx_path)
+        vectors = None
+        if params["type"] != "flat" and config["rerank"] > 0:
+            with open(vectors_path.with_name(vectors_path.name + ".tmp"), "wb") as f:
+                np.save(f, np.asarray(embs, dtype=np.float32))
+            os.replace(vectors_path.with_name(vectors_path.name + ".tmp"), vectors_path)
+            vectors = np.load(vectors_path, mmap_mode="r")
+            params["rerank"] = config["rerank"]
+        elif vectors_path.exists():
+            vectors_path.unlink()
+        return cls(index, vectors, params.get("rerank", 0)), params
+
+    @classmethod
+    def read(cls, idx_path, params=None, nprobe=None):
+        import faiss
+        params = params or {}
+        index = faiss.read_index(str(idx_path))
+        vectors_path = vectors_path_for(idx_path)
+        vectors = np.load(vectors_path, mmap_mode="r") if params.get("rerank") and vectors_path.exists() else None
+        nprobe = nprobe or int(os.getenv("INDEX_NPROBE", "8"))
+        return cls(index, vectors, params.get("rerank", 0), nprobe=nprobe)
+
+    def search(self, q_embs, k):
+        q_embs = np.ascontiguousarray(q_embs, dtype=np.float32)
+        if not self.rerank:
+            return self.index.search(q_embs, k)
+        scores, ids = self.index.search(q_embs, min(self.ntotal, k * self.rerank))
+        out_scores = np.full((len(q_embs), k), -np.inf, dtype=np.float32)
+        out_ids = np.full((len(q_embs), k), -1, dtype=np.int64)
+        for row, (q, cand) in enumerate(zip(q_embs, ids)):
+            cand = cand[cand >= 0]
+            if not len(cand):
+                continue
+            # sorted ids keep the memmap reads sequential
+            cand = np.sort(cand)
+            exact = np.asarray(self.vectors[cand]) @ q
+            top = np.argsort(-exact, kind="stable")[:k]
+            out_scores[row, :len(top)] = exact[top]
+            out_ids[row, :len(top)] = cand[top]
+        return out_scores, out_ids
+
+    def vectors_for_export(self):
+        """All vectors, exact when stored, otherwise decoded from the index (used to build the corpus index)."""
+        import faiss
+        if self.vectors is not None:
+            return np.asarray(self.vectors, dtype=np.float32)
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None:
+            ivf.make_direct_map()
+        return self.index.reconstruct_n(0, self.ntotal)